@@ -0,0 +1,150 @@
+"""Batch detection: many uploads (or zip archives) through one forward pass per batch."""
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from class_labels import label_for
+from prediction_cache import digest, source_bytes
+from preprocessing import MAX_UPLOAD_BYTES, BatchBuffer, ImageTooLarge
+
+BATCH_SIZE = 32
+DECODE_WORKERS = min(8, os.cpu_count() or 1)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+REPORT_COLUMNS = ["File", "Prediction", "Confidence (%)", "Model Version", "Error"]
+MAX_ARCHIVE_BYTES = 1024 * 1024 * 1024
+MAX_ARCHIVE_MEMBERS = 10000
+
+
+def _image_members(archive):
+    return [m for m in archive.infolist() if not m.is_dir() and m.filename.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+def _is_zip(upload):
+    return getattr(upload, "name", str(upload)).lower().endswith(".zip")
+
+
+def count_uploads(files):
+    # Number of items expand_uploads will yield, read from the zip directories only.
+    count = 0
+    for upload in files:
+        if not _is_zip(upload):
+            count += 1
+            continue
+        with zipfile.ZipFile(upload) as archive:
+            members = _image_members(archive)
+        over = len(members) > MAX_ARCHIVE_MEMBERS or sum(m.file_size for m in members) > MAX_ARCHIVE_BYTES
+        count += 1 if over else len(members)
+    return count
+
+
+def expand_uploads(files, max_bytes=MAX_UPLOAD_BYTES, max_archive_bytes=MAX_ARCHIVE_BYTES,
+                   max_members=MAX_ARCHIVE_MEMBERS):
+    """Yield (name, file-like) pairs, unpacking any zip archive into its images.
+
+    Members are decompressed one at a time as the caller asks for them.  Sizes
+    come from the zip directory, so an oversized member or archive is never
+    decompressed; it is yielded with an ``ImageTooLarge`` in place of the file
+    and reported as an error row.
+    """
+    for upload in files:
+        name = getattr(upload, "name", str(upload))
+        if not _is_zip(upload):
+            yield name, upload
+            continue
+        with zipfile.ZipFile(upload) as archive:
+            members = _image_members(archive)
+            total = sum(m.file_size for m in members)
+            if len(members) > max_members or total > max_archive_bytes:
+                yield name, ImageTooLarge(
+                    f"archive holds {len(members)} images, {total / 2 ** 20:.0f} MB uncompressed; "
+                    f"the limit is {max_members} images, {max_archive_bytes / 2 ** 20:.0f} MB"
+                )
+                continue
+            for member in members:
+                member_name = f"{name}/{member.filename}"
+                if max_bytes and member.file_size > max_bytes:
+                    yield member_name, ImageTooLarge(
+                        f"file is {member.file_size / 2 ** 20:.1f} MB, the limit is {max_bytes / 2 ** 20:.0f} MB"
+                    )
+                    continue
+                yield member_name, io.BytesIO(archive.read(member))
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def predict_batches(items, registry, batch_size=BATCH_SIZE, workers=DECODE_WORKERS, cache=None):
+    """Yield a list of result rows per batch.
+
+    Workers decode straight into one of two preallocated batch buffers while
+    the model runs on the other, so JPEG decode and the forward pass overlap.
+    Images already in ``cache`` skip both decode and inference.
+    """
+    buffers = [BatchBuffer(batch_size), BatchBuffer(batch_size)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = None
+        for number, chunk in enumerate(chunked(items, batch_size)):
+            buffer = buffers[number % 2]
+            lookups = _lookup(chunk, registry, cache)
+            rejected = {i: str(source) for i, (_, source, _, _) in enumerate(lookups) if isinstance(source, Exception)}
+            misses = [i for i, (_, _, _, found) in enumerate(lookups) if found is None and i not in rejected]
+            errors = pool.map(buffer.load, range(len(misses)), [lookups[i][1] for i in misses])
+            if pending is not None:
+                yield _run_batch(*pending, registry, cache)
+            pending = (lookups, misses, errors, rejected, buffer)
+        if pending is not None:
+            yield _run_batch(*pending, registry, cache)
+
+
+def _lookup(chunk, registry, cache):
+    # (name, source, source_key, (probs, version) or None) per item.
+    if cache is None:
+        return [(name, source, None, None) for name, source in chunk]
+    cache.watch(registry)
+    version = registry.version
+    lookups = []
+    for name, source in chunk:
+        if isinstance(source, Exception):
+            lookups.append((name, source, None, None))
+            continue
+        data = source_bytes(source)
+        source_key = digest(data)
+        probs = cache.get_source(source_key, version)
+        cache.record(hit=probs is not None)
+        lookups.append((name, data, source_key, None if probs is None else (probs, version)))
+    return lookups
+
+
+def _run_batch(lookups, misses, errors, rejected, buffer, registry, cache):
+    errors = dict(zip(misses, errors))
+    errors.update(rejected)
+    results = {i: found for i, (_, _, _, found) in enumerate(lookups) if found is not None}
+    if any(error is None for error in errors.values()):
+        predictions, version = registry.predict(buffer.view(len(misses)))
+        for row, i in enumerate(misses):
+            if errors[i] is None:
+                results[i] = (predictions[row], version)
+                if cache is not None:
+                    cache.put(digest(buffer.array[row]), version, predictions[row], lookups[i][2])
+    class_names = registry.class_names
+    rows = []
+    for i, (name, _, _, _) in enumerate(lookups):
+        if i not in results:
+            rows.append(dict(zip(REPORT_COLUMNS, [name, None, None, None, errors[i]])))
+            continue
+        probs, version = results[i]
+        index = int(np.argmax(probs))
+        label = label_for(index, class_names) or f"Class {index}"
+        rows.append(dict(zip(REPORT_COLUMNS, [name, label, round(float(probs[index]) * 100, 2), version, None])))
+    return rows
@@ -0,0 +1,257 @@
+"""Per-stage performance benchmark of the detection pipeline.
+
+    python benchmark.py --output bench.json                      # random-weight model
+    python benchmark.py --model trained_plant_disease_model.keras --output bench.json
+    python benchmark.py --output bench.json --baseline benchmark_baseline.json --threshold 0.2
+    python benchmark.py --output benchmark_baseline.json          # record a new baseline
+
+Each stage of the Predict path is timed on its own: image decode and
+resize/normalize across several photo sizes, the field-photo background
+filter, model load, single and batched inference, guide lookup, translation
+(memory hit, disk hit, miss) and the prediction cache.  Cold start is
+measured by importing what each page needs in a fresh interpreter.  Without
+``--model`` a randomly initialised network with the training notebook's
+architecture is used and translation misses go to a local stand-in, so the
+suite needs neither the real weights nor the network.
+
+With ``--baseline`` every stage whose median exceeds the baseline median by
+more than ``--threshold`` is reported and the exit status is 1.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from class_labels import CLASS_NAMES, load_class_names
+from field_analysis import TILE_SIZE, green_fractions, load_field_image, positions
+from knowledge_base import KnowledgeBase
+from model_registry import LoadedModel, load_engine
+from prediction_cache import PredictionCache
+from preprocessing import BatchBuffer, IMAGE_SIZE, decode, open_image, resize_into
+from translation_cache import TranslationCache, Translator
+
+# Modules each kind of page imports on a fresh process.
+COLD_START_IMPORTS = {
+    "static_pages": ["streamlit", "metrics", "translation_cache"],
+    "detection_page": ["streamlit", "metrics", "translation_cache", "detection_page"],
+    "detection_page_model": ["streamlit", "metrics", "translation_cache", "detection_page", "tensorflow"],
+}
+COLD_START_SCRIPT = """
+import importlib, resource, sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+IMAGE_SIZES = [(640, 480), (1600, 1200), (4000, 3000)]
+BATCH_SIZES = [1, 8, 32]
+
+
+def measure(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return {
+        "median_ms": round(1000 * statistics.median(durations), 4),
+        "p95_ms": round(1000 * durations[min(len(durations) - 1, int(0.95 * len(durations)))], 4),
+        "min_ms": round(1000 * durations[0], 4),
+        "runs": repeat,
+    }
+
+
+def synthetic_jpeg(size, seed=0):
+    # Smooth gradients plus noise compress like a real photo, unlike pure noise.
+    width, height = size
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 / width, y * 255 / height, (x + y) * 127 / (width + height)], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def cold_start(modules):
+    command = [sys.executable, "-c", COLD_START_SCRIPT] + modules
+    result = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        return None
+    seconds, max_rss = result.stdout.split()
+    return float(seconds), int(max_rss)
+
+
+def bench_cold_start(results, repeat):
+    # Each run is a new interpreter; sets whose packages are missing are skipped.
+    for name, modules in COLD_START_IMPORTS.items():
+        runs = [cold_start(modules) for _ in range(max(1, repeat // 10))]
+        if None in runs:
+            print(f"Skipping cold_start/{name}: could not import {', '.join(modules)}", file=sys.stderr)
+            continue
+        durations = sorted(seconds for seconds, _ in runs)
+        results[f"cold_start/{name}"] = {
+            "median_ms": round(1000 * statistics.median(durations), 4),
+            "min_ms": round(1000 * durations[0], 4),
+            "max_rss_kb": max(rss for _, rss in runs),
+            "runs": len(runs),
+        }
+
+
+def bench_preprocessing(results, repeat):
+    row = np.empty(IMAGE_SIZE[::-1] + (3,), dtype=np.float32)
+    for size in IMAGE_SIZES:
+        data = synthetic_jpeg(size)
+        label = f"{size[0]}x{size[1]}"
+
+        def _decode():
+            with open_image(data) as image:
+                return decode(image)
+
+        decoded = _decode()
+        results[f"decode/{label}"] = measure(_decode, repeat)
+        results[f"resize_normalize/{label}"] = measure(lambda: resize_into(decoded, row), repeat)
+
+
+def bench_field_filter(results, repeat):
+    # Background filter of field-photo mode on a 12 MP photo, after the
+    # same downscaling analyze() applies.
+    pixels = np.asarray(load_field_image(synthetic_jpeg(IMAGE_SIZES[-1])))
+    ys = positions(pixels.shape[0], TILE_SIZE, TILE_SIZE // 2)
+    xs = positions(pixels.shape[1], TILE_SIZE, TILE_SIZE // 2)
+    results["field_filter"] = measure(lambda: green_fractions(pixels, ys, xs, TILE_SIZE), max(3, repeat // 5))
+
+
+def random_model_file(directory):
+    from model_architecture import build_plant_cnn
+    path = os.path.join(directory, "random_plant_disease_model.keras")
+    build_plant_cnn().save(path)
+    return path
+
+
+def bench_model(results, model_path, repeat):
+    results["model_load"] = measure(lambda: load_engine(model_path), max(1, repeat // 10), warmup=0)
+    model = LoadedModel(load_engine(model_path), "bench", model_path, load_class_names(model_path))
+    model.warm_up()
+    for batch_size in BATCH_SIZES:
+        batch = BatchBuffer(batch_size).view(batch_size)
+        batch[...] = np.random.default_rng(0).uniform(0, 255, batch.shape)
+        stats = measure(lambda: model.predict(batch), max(3, repeat // batch_size))
+        stats["per_image_ms"] = round(stats["median_ms"] / batch_size, 4)
+        results[f"inference/batch_{batch_size}"] = stats
+    return model
+
+
+def bench_guide(results, class_names, repeat):
+    knowledge_base = KnowledgeBase(class_names)
+    indices = list(range(len(class_names)))
+    knowledge_base.entry(0)
+    results["guide_lookup"] = measure(lambda: [knowledge_base.entry(i) for i in indices], repeat)
+    results["guide_lookup"]["per_lookup_ms"] = round(results["guide_lookup"]["median_ms"] / len(indices), 6)
+
+
+def bench_translation(results, directory, repeat):
+    cache = TranslationCache(os.path.join(directory, "translations.sqlite3"))
+    translator = Translator(cache=cache, translate_fn=lambda text, target: text[::-1])
+    counter = iter(range(10 ** 9))
+    results["translation/miss"] = measure(lambda: translator.translate(f"benchmark text {next(counter)}", "te"), repeat)
+    translator.translate("Tomato Leaf Mold", "te")
+    results["translation/memory_hit"] = measure(lambda: translator.translate("Tomato Leaf Mold", "te"), repeat)
+    cold = lambda: Translator(cache=cache, translate_fn=None).translate("Tomato Leaf Mold", "te")
+    results["translation/disk_hit"] = measure(cold, repeat)
+
+
+def bench_prediction_cache(results, model, repeat):
+    class Registry:
+        version = model.version
+        class_names = model.class_names
+
+        def predict(self, batch):
+            return model.predict(batch), model.version
+
+        def subscribe(self, listener):
+            pass
+
+    registry = Registry()
+    cache = PredictionCache()
+    data = synthetic_jpeg(IMAGE_SIZES[1])
+    cache.predict(registry, data)
+    results["prediction_cache/hit"] = measure(lambda: cache.predict(registry, data), repeat)
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for stage, stats in sorted(results.items()):
+        before = baseline.get("results", {}).get(stage)
+        if not before:
+            continue
+        ratio = stats["median_ms"] / before["median_ms"] if before["median_ms"] else 1.0
+        marker = "REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{stage:40s} {before['median_ms']:>10.3f} -> {stats['median_ms']:>10.3f} ms  x{ratio:5.2f} {marker}")
+        if marker:
+            regressions.append(stage)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the leaf disease pipeline.")
+    parser.add_argument("--model", help="model file to load; defaults to a random-weight copy of the architecture")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument("--skip-model", action="store_true", help="only run the stages that need no TensorFlow")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        bench_cold_start(results, args.repeat)
+        bench_preprocessing(results, args.repeat)
+        bench_field_filter(results, args.repeat)
+        bench_translation(results, directory, args.repeat)
+        class_names = load_class_names(args.model) if args.model else CLASS_NAMES
+        bench_guide(results, class_names, args.repeat)
+        if not args.skip_model:
+            model_path = args.model or random_model_file(directory)
+            model = bench_model(results, model_path, args.repeat)
+            bench_prediction_cache(results, model, args.repeat)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model": args.model or "random-weights",
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} stage timings to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} stage(s) slower than baseline by more than {args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
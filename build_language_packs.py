@@ -0,0 +1,90 @@
+"""Pre-translate the app's static strings and disease guide into language packs.
+
+Run once after editing main.py or the guide CSV (this is the only step that
+talks to the translation service):
+
+    python build_language_packs.py --languages te
+
+Every string literal passed to ``translate_text`` in the app, every class
+label and heading and every field of tomato_disease_guide_detailed.csv is translated and
+written to ``language_packs/<code>.json``, which the app loads at startup.
+Existing entries are reused unless ``--refresh`` is given, which translates
+every string again, bypassing the translation cache, and updates that cache.
+"""
+import argparse
+import ast
+import json
+import os
+
+from class_labels import CLASS_NAMES, display_name
+from knowledge_base import HEADINGS, read_guide
+from translation_cache import PACK_DIR, TranslationCache, Translator, load_language_packs
+
+APP_SOURCES = ["main.py", "detection_page.py"]
+GUIDE_FIELDS = ["Symptoms", "Organic Pesticides", "Tips"]
+
+
+def app_strings(paths=APP_SOURCES):
+    strings = set()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Name)
+                and node.func.id == "translate_text"
+                and node.args
+                and isinstance(node.args[0], ast.Constant)
+                and isinstance(node.args[0].value, str)
+            ):
+                strings.add(node.args[0].value)
+    return strings
+
+
+def guide_strings():
+    strings = set()
+    for row in read_guide().values():
+        strings.update(row[field] for field in GUIDE_FIELDS if row.get(field))
+    return strings
+
+
+def static_strings():
+    return sorted(app_strings() | guide_strings() | set(HEADINGS) | {display_name(name) for name in CLASS_NAMES})
+
+
+def build_pack(target, strings, translator, existing=None):
+    pack = dict(existing or {})
+    for text in strings:
+        if text not in pack:
+            pack[text] = translator.translate(text, target)
+    return {text: pack[text] for text in strings}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build offline translation packs for the app.")
+    parser.add_argument("--languages", nargs="+", default=["te"], help="target language codes")
+    parser.add_argument("--output-dir", default=PACK_DIR)
+    parser.add_argument("--refresh", action="store_true", help="re-translate strings already in the pack")
+    args = parser.parse_args(argv)
+
+    strings = static_strings()
+    existing = {} if args.refresh else load_language_packs(args.output_dir)
+    cache = TranslationCache()
+    # Translate through the disk cache only; the packs being rebuilt are not
+    # consulted.  --refresh bypasses the cache too and overwrites its entries.
+    translator = Translator(cache=None if args.refresh else cache)
+    os.makedirs(args.output_dir, exist_ok=True)
+    for target in args.languages:
+        pack = build_pack(target, strings, translator, existing.get(target))
+        if args.refresh:
+            for text, translated in pack.items():
+                cache.put(text, target, translated)
+        path = os.path.join(args.output_dir, f"{target}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(pack, f, ensure_ascii=False, indent=1, sort_keys=True)
+        print(f"Wrote {len(pack)} strings to {path}")
+
+
+if __name__ == "__main__":
+    main()
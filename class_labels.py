@@ -0,0 +1,86 @@
+"""Class names of the classifier outputs and their display labels."""
+import json
+import os
+
+# Class folders of the training set, in the order image_dataset_from_directory
+# assigned output indices to them.
+CLASS_NAMES = [
+    "Apple___Apple_scab",
+    "Apple___Black_rot",
+    "Apple___Cedar_apple_rust",
+    "Apple___healthy",
+    "Blueberry___healthy",
+    "Cherry_(including_sour)___Powdery_mildew",
+    "Cherry_(including_sour)___healthy",
+    "Corn_(maize)___Cercospora_leaf_spot Gray_leaf_spot",
+    "Corn_(maize)___Common_rust_",
+    "Corn_(maize)___Northern_Leaf_Blight",
+    "Corn_(maize)___healthy",
+    "Grape___Black_rot",
+    "Grape___Esca_(Black_Measles)",
+    "Grape___Leaf_blight_(Isariopsis_Leaf_Spot)",
+    "Grape___healthy",
+    "Orange___Haunglongbing_(Citrus_greening)",
+    "Peach___Bacterial_spot",
+    "Peach___healthy",
+    "Pepper,_bell___Bacterial_spot",
+    "Pepper,_bell___healthy",
+    "Potato___Early_blight",
+    "Potato___Late_blight",
+    "Potato___healthy",
+    "Raspberry___healthy",
+    "Soybean___healthy",
+    "Squash___Powdery_mildew",
+    "Strawberry___Leaf_scorch",
+    "Strawberry___healthy",
+    "Tomato___Bacterial_spot",
+    "Tomato___Early_blight",
+    "Tomato___Late_blight",
+    "Tomato___Leaf_Mold",
+    "Tomato___Septoria_leaf_spot",
+    "Tomato___Spider_mites Two-spotted_spider_mite",
+    "Tomato___Target_Spot",
+    "Tomato___Tomato_Yellow_Leaf_Curl_Virus",
+    "Tomato___Tomato_mosaic_virus",
+    "Tomato___healthy",
+]
+
+TOMATO_DISPLAY_NAMES = {
+    "Tomato___Bacterial_spot": "Tomato Bacterial Spot",
+    "Tomato___Early_blight": "Tomato Early Blight",
+    "Tomato___Late_blight": "Tomato Late Blight",
+    "Tomato___Leaf_Mold": "Tomato Leaf Mold",
+    "Tomato___Septoria_leaf_spot": "Tomato Septoria Leaf Spot",
+    "Tomato___Spider_mites Two-spotted_spider_mite": "Tomato Spider Mites",
+    "Tomato___Target_Spot": "Tomato Target Spot",
+    "Tomato___Tomato_Yellow_Leaf_Curl_Virus": "Tomato Yellow Leaf Curl Virus",
+    "Tomato___Tomato_mosaic_virus": "Tomato Mosaic Virus",
+    "Tomato___healthy": "Tomato Healthy",
+}
+
+
+def display_name(class_name):
+    if class_name in TOMATO_DISPLAY_NAMES:
+        return TOMATO_DISPLAY_NAMES[class_name]
+    crop, _, condition = class_name.partition("___")
+    return " ".join(f"{crop} {condition}".replace("_", " ").split())
+
+
+def label_for(index, class_names=CLASS_NAMES):
+    if index is not None and 0 <= index < len(class_names):
+        return display_name(class_names[index])
+    return None
+
+
+def class_names_path(model_path):
+    # A model trained on a different class set ships its order next to it,
+    # e.g. tomato_student_model.keras -> tomato_student_model_classes.json.
+    return os.path.splitext(model_path)[0] + "_classes.json"
+
+
+def load_class_names(model_path):
+    path = class_names_path(model_path)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return list(CLASS_NAMES)
@@ -0,0 +1,136 @@
+"""Export the Keras model to float16 and int8 TFLite and check parity.
+
+    python convert_tflite.py --calibration-dir /data/train --validation-dir /data/valid
+
+The int8 model is calibrated on a random sample of ``--calibration-dir``
+images and keeps float32 inputs/outputs, so it is a drop-in replacement for
+the Keras model (select it with ``MODEL_ENGINE=int8``).  Every exported
+variant is then run side by side with the Keras model on up to
+``--num-validation`` images from ``--validation-dir``; top-1 agreement,
+confidence drift, accuracy (when folder labels match the model outputs),
+latency and file size are written to ``--report``.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+from class_labels import class_names_path, load_class_names
+from model_registry import ENGINE_PATHS, KerasEngine, TFLiteEngine
+from preprocessing import load_image
+from score_images import class_folders, walk_images
+
+
+def sample_paths(root, count, seed=0):
+    items = list(walk_images(root))
+    random.Random(seed).shuffle(items)
+    return items[:count]
+
+
+def convert(model, mode, calibration_paths=()):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == "int8":
+        def representative_dataset():
+            for path, _ in calibration_paths:
+                yield [load_image(path)[np.newaxis]]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    else:
+        raise ValueError(f"unknown TFLite mode: {mode}")
+    return converter.convert()
+
+
+def _timed_predict(engine, batch):
+    start = time.perf_counter()
+    probs = engine.predict(batch)
+    return probs, time.perf_counter() - start
+
+
+def parity_report(keras_engine, engines, validation_items, class_names, paths, batch_size=32):
+    results = {name: {"agree": 0, "correct": 0, "drift": [], "seconds": 0.0} for name in ["keras"] + list(engines)}
+    labelled = 0
+    index = {name: i for i, name in enumerate(class_names)}
+    for start in range(0, len(validation_items), batch_size):
+        chunk = validation_items[start:start + batch_size]
+        batch = np.stack([load_image(path) for path, _ in chunk])
+        reference, seconds = _timed_predict(keras_engine, batch)
+        results["keras"]["seconds"] += seconds
+        reference_top = reference.argmax(axis=1)
+        truth = np.array([index.get(label, -1) for _, label in chunk])
+        use_labels = len(class_names) == reference.shape[1]
+        if use_labels:
+            labelled += int((truth >= 0).sum())
+            results["keras"]["correct"] += int((reference_top == truth).sum())
+        for name, engine in engines.items():
+            probs, seconds = _timed_predict(engine, batch)
+            top = probs.argmax(axis=1)
+            stats = results[name]
+            stats["seconds"] += seconds
+            stats["agree"] += int((top == reference_top).sum())
+            # Drift of the confidence the Keras model gave its own top class.
+            rows = np.arange(len(chunk))
+            stats["drift"].extend(np.abs(probs[rows, reference_top] - reference[rows, reference_top]).tolist())
+            if use_labels:
+                stats["correct"] += int((top == truth).sum())
+
+    total = len(validation_items)
+    report = {"images": total, "labelled_images": labelled, "engines": {}}
+    for name, stats in results.items():
+        entry = {
+            "file": paths[name],
+            "size_mb": round(os.path.getsize(paths[name]) / 2 ** 20, 2),
+            "ms_per_image": round(1000 * stats["seconds"] / max(total, 1), 3),
+        }
+        if labelled:
+            entry["accuracy"] = round(stats["correct"] / labelled, 4)
+        if name != "keras":
+            drift = np.array(stats["drift"])
+            entry["top1_agreement"] = round(stats["agree"] / max(total, 1), 4)
+            entry["mean_confidence_drift"] = round(float(drift.mean()), 5) if drift.size else None
+            entry["max_confidence_drift"] = round(float(drift.max()), 5) if drift.size else None
+        report["engines"][name] = entry
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export TFLite variants of the disease model.")
+    parser.add_argument("--model", default=ENGINE_PATHS["keras"])
+    parser.add_argument("--calibration-dir", required=True, help="images used to calibrate int8 ranges")
+    parser.add_argument("--num-calibration", type=int, default=200)
+    parser.add_argument("--validation-dir", required=True, help="class-per-folder images for the parity check")
+    parser.add_argument("--num-validation", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=None, help="TFLite interpreter threads for the check")
+    parser.add_argument("--report", default="tflite_parity_report.json")
+    args = parser.parse_args(argv)
+
+    import tensorflow as tf
+    model = tf.keras.models.load_model(args.model)
+    class_names = load_class_names(args.model)
+    calibration = sample_paths(args.calibration_dir, args.num_calibration)
+    for mode in ("float16", "int8"):
+        tflite_model = convert(model, mode, calibration)
+        with open(ENGINE_PATHS[mode], "wb") as f:
+            f.write(tflite_model)
+        # The exports keep the source model's output order.
+        with open(class_names_path(ENGINE_PATHS[mode]), "w", encoding="utf-8") as f:
+            json.dump(class_names, f, indent=2)
+        print(f"Wrote {ENGINE_PATHS[mode]} and {class_names_path(ENGINE_PATHS[mode])}")
+
+    engines = {mode: TFLiteEngine(ENGINE_PATHS[mode], args.threads) for mode in ("float16", "int8")}
+    validation = sample_paths(args.validation_dir, args.num_validation)
+    paths = dict(ENGINE_PATHS, keras=args.model)
+    report = parity_report(KerasEngine(model), engines, validation, class_folders(args.validation_dir), paths)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
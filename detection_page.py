@@ -0,0 +1,161 @@
+"""Disease Detection page.
+
+Imported by main.py only when this page is opened (or by the background
+warm-up thread), so the Home, Care Guide and Chatbot pages never pay for
+NumPy, Pillow or TensorFlow.
+"""
+import csv
+import io
+
+import numpy as np
+import streamlit as st
+
+from batch_inference import REPORT_COLUMNS, count_uploads, expand_uploads, predict_batches
+from class_labels import load_class_names
+from field_analysis import TILE_SIZE, analyze, heatmap_overlay
+from knowledge_base import get_knowledge_base
+from metrics import METRICS
+from model_registry import DEFAULT_ENGINE, ENGINE_PATHS, get_registry
+from prediction_cache import get_prediction_cache
+
+
+def load_knowledge_base():
+    # Validated and indexed once per process (get_knowledge_base is cached)
+    return get_knowledge_base(load_class_names(ENGINE_PATHS[DEFAULT_ENGINE]))
+
+
+def warm_up():
+    # Runs off the script thread; errors surface when the page is opened.
+    try:
+        load_knowledge_base()
+        get_registry()
+    except Exception:
+        pass
+
+
+def guide_entry(knowledge_base, result_index, language, translate):
+    try:
+        with METRICS.timed("guide_lookup"):
+            return knowledge_base.entry(result_index, language, translate)
+    except Exception as e:
+        st.error(f"Translation Error: {e}")
+        return knowledge_base.entry(result_index)
+
+
+def model_prediction(test_image, engine=None, num_threads=None):
+    METRICS.inc("requests_total", path="single")
+    try:
+        with METRICS.timed("predict_request"):
+            # Shared, pre-warmed model (loaded once per process, hot-reloaded on change)
+            registry = get_registry(engine=engine, num_threads=num_threads)  # MODEL_ENGINE / TFLITE_NUM_THREADS by default
+            # Repeat uploads are answered from the prediction cache without decode or inference
+            predictions, model_version = get_prediction_cache().predict(registry, test_image)
+            # Labels must come from the model that answered, not the default engine
+            class_names = registry.class_names
+        result_index = int(np.argmax(predictions))  # Get highest confidence prediction
+        confidence = float(np.max(predictions)) * 100  # Convert to percentage
+        return result_index, confidence, model_version, class_names
+    except Exception as e:
+        st.error(f"Model Prediction Error: {e}")
+        return None, None, None, None
+
+
+def render_batch(translate_text):
+    st.header(translate_text("Upload Plant Leaf Images"))
+    batch_files = st.file_uploader("Choose Images or Zip Archives:", type=["jpg", "png", "jpeg", "zip"], accept_multiple_files=True)
+    if batch_files and st.button("Predict All"):
+        METRICS.inc("requests_total", path="batch")
+        registry = get_registry()
+        results = []
+        table = st.empty()
+        progress = st.progress(0, text="Analyzing images...")
+        try:
+            # Archives are unpacked lazily; the total comes from their directories
+            total = max(count_uploads(batch_files), 1)
+            with METRICS.timed("batch_request"):
+                for rows in predict_batches(expand_uploads(batch_files), registry, cache=get_prediction_cache()):
+                    results.extend(rows)
+                    table.dataframe(results, use_container_width=True)
+                    progress.progress(min(len(results) / total, 1.0), text=f"Analyzed {len(results)} of {total} images")
+        except Exception as e:
+            st.error(f"Model Prediction Error: {e}")
+        if results:
+            report = io.StringIO()
+            writer = csv.DictWriter(report, fieldnames=REPORT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(results)
+            st.download_button(label=translate_text("📄 Download Report"), data=report.getvalue(), file_name="plant_disease_batch_report.csv", mime="text/csv")
+
+
+def render_single(translate_text, language, translate):
+    st.header(translate_text("Upload a Plant Leaf Image"))
+    test_image = st.file_uploader("Choose an Image:", type=["jpg", "png", "jpeg"])
+    if test_image:
+        st.image(test_image, caption="Uploaded Image", use_column_width=True)
+        if st.button("Predict"):
+            with st.spinner(" Analyzing Image... Please wait."):
+                result_index, confidence, model_version, class_names = model_prediction(test_image)
+            if result_index is not None:
+                knowledge_base = get_knowledge_base(class_names)
+                predicted_disease = knowledge_base.label(result_index)
+                entry = guide_entry(knowledge_base, result_index, language, translate)
+                st.success(f"✅ {translate_text('Model Prediction')}: {entry.label if entry else translate_text(predicted_disease)} ({confidence:.2f}% Confidence)")
+                st.caption(f"Model version: {model_version}")
+                # Recommendations come from the pre-built guide index, no CSV read per request
+                if entry is not None:
+                    st.info(f"🌿 {translate_text('Symptoms')}: {entry.symptoms}")
+                    st.warning(f"🐞 {translate_text('Organic Pesticides')}: {entry.organic_pesticides}")
+                    st.success(f"💡 {translate_text('Tips')}: {entry.tips}")
+                    # Allow users to download the report
+                    report_text = f"{entry.report}\nModel version: {model_version}"
+                    st.download_button(label=translate_text("📄 Download Report"), data=report_text, file_name="plant_disease_report.txt")
+                else:
+                    st.error(f"It's not a tomato,It's a: {predicted_disease},can i suggest a pesticide for only a Tomato leaf diseases.")
+            else:
+                st.error("Upload a Tomato leaf with a clarity.It's not clear tomato leaf image so model could not make a valid prediction. Please try again with clear image.")
+
+
+def render_field(translate_text):
+    st.header(translate_text("Upload a Field Photo"))
+    st.caption(translate_text("The photo is split into tiles; background tiles are skipped and every leafy tile is classified."))
+    field_image = st.file_uploader("Choose an Image:", type=["jpg", "png", "jpeg"], key="field_image")
+    tile_size = st.slider("Tile size (pixels)", min_value=128, max_value=512, value=TILE_SIZE, step=32)
+    overlap = st.slider("Tile overlap (%)", min_value=0, max_value=75, value=50, step=25)
+    if field_image and st.button("Analyze Field Photo"):
+        METRICS.inc("requests_total", path="field")
+        try:
+            with st.spinner(" Analyzing Image... Please wait."), METRICS.timed("field_request"):
+                stride = max(1, tile_size * (100 - overlap) // 100)
+                analysis = analyze(field_image, get_registry(), tile_size=tile_size, stride=stride)
+        except Exception as e:
+            st.error(f"Model Prediction Error: {e}")
+            return
+        summary = analysis.summary
+        st.image(heatmap_overlay(analysis), caption="Green: healthy, red: diseased", use_column_width=True)
+        if not summary["leaf_tiles"]:
+            st.warning(translate_text("No leaves were found in this photo."))
+            return
+        columns = st.columns(3)
+        columns[0].metric(translate_text("Tomato Leaf Regions"), summary["tomato_tiles"])
+        columns[1].metric(translate_text("Infected"), f"{summary['infected_fraction']:.0%}")
+        columns[2].metric(translate_text("Main Disease"), summary["dominant_disease"] or "-")
+        if summary["diseases"]:
+            st.dataframe([{"Disease": name, "Regions": count} for name, count in summary["diseases"].items()], use_container_width=True)
+        if summary["unrecognised_tiles"]:
+            st.info(f"{summary['unrecognised_tiles']} leafy regions did not look like tomato and were left out.")
+        st.caption(f"{summary['skipped_tiles']} background tiles skipped, {summary['forward_passes']} batches, model version: {analysis.model_version}")
+
+
+def render(translate_text, language, translate):
+    """Draw the page; ``translate`` maps English text into ``language``."""
+    try:
+        load_knowledge_base()
+    except Exception as e:
+        st.error(f"Disease Guide Error: {e}")
+    detection_mode = st.radio("Mode", ["Single Image", "Batch", "Field Photo"], horizontal=True)
+    if detection_mode == "Batch":
+        render_batch(translate_text)
+    elif detection_mode == "Field Photo":
+        render_field(translate_text)
+    else:
+        render_single(translate_text, language, translate)
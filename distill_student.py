@@ -0,0 +1,173 @@
+"""Distill the 38-class CNN into a compact tomato-only student model.
+
+    python distill_student.py --train-dir /data/train --validation-dir /data/valid --width 0.5
+
+The student (``model_architecture.build_student``) sees only the tomato
+class folders.  It is trained on a mix of the true labels and the teacher's
+softened probabilities over the same classes, then saved as
+``tomato_student_model.keras`` with its class order in
+``tomato_student_model_classes.json``.  Serve it with ``MODEL_ENGINE=student``.
+
+Both models are then scored on the tomato images of ``--validation-dir`` and
+file size, parameter count, CPU latency and accuracy are written side by side
+to ``--report``.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from benchmark import measure
+from class_labels import CLASS_NAMES, class_names_path, load_class_names
+from model_registry import ENGINE_PATHS, KerasEngine
+from preprocessing import BatchBuffer, IMAGE_SIZE
+from score_images import walk_images
+
+LATENCY_BATCH_SIZES = [1, 32]
+
+
+def tomato_classes(class_names=CLASS_NAMES):
+    return [name for name in class_names if name.startswith("Tomato___")]
+
+
+def training_dataset(train_dir, class_names, batch_size, seed=0):
+    import tensorflow as tf
+    dataset = tf.keras.utils.image_dataset_from_directory(
+        train_dir,
+        labels="inferred",
+        label_mode="categorical",
+        class_names=class_names,
+        image_size=IMAGE_SIZE,
+        batch_size=batch_size,
+        shuffle=True,
+        seed=seed,
+    )
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def distill(teacher, student, dataset, teacher_indices, epochs, temperature=4.0, alpha=0.3, learning_rate=1e-3):
+    """Train ``student`` on ``alpha`` * label loss + (1 - ``alpha``) * soft-target loss."""
+    import tensorflow as tf
+    logits_model = tf.keras.Model(student.inputs, student.get_layer("logits").output)
+    optimizer = tf.keras.optimizers.Adam(learning_rate=learning_rate)
+    indices = tf.constant(teacher_indices)
+
+    @tf.function
+    def train_step(images, labels):
+        # Teacher probabilities over the student's classes, renormalized and
+        # softened by ``temperature``.
+        teacher_probs = tf.gather(teacher(images, training=False), indices, axis=1)
+        teacher_logits = tf.math.log(teacher_probs + 1e-8)
+        soft_targets = tf.nn.softmax(teacher_logits / temperature)
+        with tf.GradientTape() as tape:
+            logits = logits_model(images, training=True)
+            hard_loss = tf.reduce_mean(tf.nn.softmax_cross_entropy_with_logits(labels, logits))
+            soft_loss = tf.reduce_mean(tf.nn.softmax_cross_entropy_with_logits(soft_targets, logits / temperature))
+            loss = alpha * hard_loss + (1 - alpha) * temperature ** 2 * soft_loss
+        gradients = tape.gradient(loss, student.trainable_variables)
+        optimizer.apply_gradients(zip(gradients, student.trainable_variables))
+        return loss
+
+    history = []
+    for epoch in range(epochs):
+        losses = [float(train_step(images, labels)) for images, labels in dataset]
+        history.append(float(np.mean(losses)))
+        print(f"epoch {epoch + 1}/{epochs}: loss {history[-1]:.4f}")
+    return history
+
+
+def accuracy(engine, items, class_names, batch_size=32):
+    index = {name: i for i, name in enumerate(class_names)}
+    buffer = BatchBuffer(batch_size)
+    correct = 0
+    scored = 0
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+        loaded = [i for i, (path, _) in enumerate(chunk) if buffer.load(i, path) is None]
+        top = engine.predict(buffer.view(len(chunk))).argmax(axis=1)
+        for i in loaded:
+            scored += 1
+            correct += int(top[i] == index.get(chunk[i][1], -1))
+    return correct / scored if scored else None
+
+
+def latency(engine, repeat):
+    results = {}
+    for batch_size in LATENCY_BATCH_SIZES:
+        batch = BatchBuffer(batch_size).view(batch_size)
+        batch[...] = np.random.default_rng(0).uniform(0, 255, batch.shape)
+        engine.predict(batch)
+        stats = measure(lambda: engine.predict(batch), max(3, repeat // batch_size))
+        results[f"batch_{batch_size}_ms_per_image"] = round(stats["median_ms"] / batch_size, 4)
+        results[f"batch_{batch_size}_images_per_second"] = round(1000 * batch_size / stats["median_ms"], 1)
+    return results
+
+
+def compare_models(models, items, repeat):
+    report = {"validation_images": len(items), "models": {}}
+    for name, (model, path, class_names) in models.items():
+        engine = KerasEngine(model)
+        entry = {
+            "file": path,
+            "size_mb": round(os.path.getsize(path) / 2 ** 20, 2),
+            "parameters": int(model.count_params()),
+            "classes": len(class_names),
+        }
+        entry.update(latency(engine, repeat))
+        if items:
+            entry["accuracy"] = round(accuracy(engine, items, class_names), 4)
+        report["models"][name] = entry
+    teacher, student = report["models"]["teacher"], report["models"]["student"]
+    report["speedup_batch_1"] = round(teacher["batch_1_ms_per_image"] / student["batch_1_ms_per_image"], 2)
+    report["size_ratio"] = round(teacher["size_mb"] / max(student["size_mb"], 0.01), 2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distill a compact tomato-only student from the disease model.")
+    parser.add_argument("--teacher", default=ENGINE_PATHS["keras"])
+    parser.add_argument("--train-dir", required=True, help="class-per-folder training images")
+    parser.add_argument("--validation-dir", help="class-per-folder images for the side-by-side report")
+    parser.add_argument("--output", default=ENGINE_PATHS["student"])
+    parser.add_argument("--width", type=float, default=0.5, help="width multiplier of the student blocks")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--learning-rate", type=float, default=1e-3)
+    parser.add_argument("--temperature", type=float, default=4.0)
+    parser.add_argument("--alpha", type=float, default=0.3, help="weight of the true-label loss")
+    parser.add_argument("--repeat", type=int, default=30, help="timed runs per latency measurement")
+    parser.add_argument("--report", default="student_report.json")
+    args = parser.parse_args(argv)
+
+    import tensorflow as tf
+    from model_architecture import build_student
+    teacher = tf.keras.models.load_model(args.teacher)
+    teacher_names = load_class_names(args.teacher)
+    class_names = tomato_classes(teacher_names)
+    teacher_indices = [teacher_names.index(name) for name in class_names]
+
+    student = build_student(len(class_names), width=args.width)
+    dataset = training_dataset(args.train_dir, class_names, args.batch_size)
+    distill(teacher, student, dataset, teacher_indices, args.epochs, args.temperature, args.alpha, args.learning_rate)
+    student.save(args.output)
+    with open(class_names_path(args.output), "w", encoding="utf-8") as f:
+        json.dump(class_names, f, indent=2)
+    print(f"Wrote {args.output} and {class_names_path(args.output)}")
+
+    items = []
+    if args.validation_dir:
+        items = [(path, label) for path, label in walk_images(args.validation_dir) if label in class_names]
+    models = {
+        "teacher": (teacher, args.teacher, teacher_names),
+        "student": (student, args.output, class_names),
+    }
+    report = compare_models(models, items, args.repeat)
+    report["width"] = args.width
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Tiled analysis of wide shots that hold many leaves.
+
+Squashing a field photo to 128x128 leaves too little detail per leaf for
+the classifier.  Instead, a window of ``tile_size`` pixels slides over the
+photo with step ``stride``.  Tiles that are mostly background are dropped
+before inference: the excess-green index (2G - R - B) of every pixel is
+thresholded once, and a summed-area table gives the green fraction of all
+tiles at the same time.  The remaining tiles are resized into preallocated
+batches, so a 12 MP photo costs a few forward passes.
+
+The result has the class and disease probability of every tile, laid out on
+the tile grid (the heatmap), plus a summary of how much of the plant looks
+infected and by what.  Only tomato classes count: a tile the model assigns
+to another crop is reported as unrecognised and left off the heatmap.
+"""
+from collections import Counter, namedtuple
+
+import numpy as np
+from PIL import Image
+
+from batch_inference import BATCH_SIZE, chunked
+from class_labels import label_for
+from metrics import METRICS
+from preprocessing import BatchBuffer, decode, open_image, resize_into
+
+TILE_SIZE = 256
+# Longest side the photo is reduced to before tiling; bounds tiles per photo.
+MAX_SIDE = 2048
+GREEN_THRESHOLD = 20
+MIN_GREEN_FRACTION = 0.15
+
+FieldAnalysis = namedtuple(
+    "FieldAnalysis", ["image", "tiles", "boxes", "classes", "confidences", "heatmap", "summary", "model_version"]
+)
+
+
+def positions(length, tile_size, stride):
+    # Window offsets along one axis; the last window is aligned to the edge
+    # so no strip of the photo is left out.
+    if length <= tile_size:
+        return [0]
+    offsets = list(range(0, length - tile_size + 1, stride))
+    if offsets[-1] != length - tile_size:
+        offsets.append(length - tile_size)
+    return offsets
+
+
+def green_fractions(pixels, ys, xs, tile_size, threshold=GREEN_THRESHOLD):
+    """Fraction of vegetation pixels in every tile, as a (len(ys), len(xs)) array."""
+    rgb = pixels.astype(np.int16)
+    green = (2 * rgb[..., 1] - rgb[..., 0] - rgb[..., 2]) > threshold
+    # Summed-area table with a zero row and column in front.
+    table = np.zeros((green.shape[0] + 1, green.shape[1] + 1), dtype=np.int64)
+    np.cumsum(np.cumsum(green, axis=0), axis=1, out=table[1:, 1:])
+    y0 = np.asarray(ys)[:, None]
+    x0 = np.asarray(xs)[None, :]
+    y1 = np.minimum(y0 + tile_size, green.shape[0])
+    x1 = np.minimum(x0 + tile_size, green.shape[1])
+    counts = table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0]
+    return counts / ((y1 - y0) * (x1 - x0))
+
+
+def load_field_image(source, max_side=MAX_SIDE):
+    with open_image(source) as image:
+        with METRICS.timed("decode"):
+            decoded = decode(image, (max_side, max_side))
+            if max(decoded.size) > max_side:
+                decoded = decoded.copy()
+                decoded.thumbnail((max_side, max_side))
+            return decoded
+
+
+def tomato_mask(class_names):
+    return np.array([name.startswith("Tomato___") for name in class_names])
+
+
+def disease_mask(class_names):
+    # Tomato diseases only; healthy tomato and other crops do not count.
+    return tomato_mask(class_names) & np.array([not name.endswith("healthy") for name in class_names])
+
+
+def analyze(source, registry, tile_size=TILE_SIZE, stride=None, batch_size=BATCH_SIZE,
+            min_green=MIN_GREEN_FRACTION, max_side=MAX_SIDE):
+    """Classify every leafy tile of a photo; see ``FieldAnalysis`` for the result."""
+    stride = stride or tile_size // 2
+    image = load_field_image(source, max_side)
+    pixels = np.asarray(image)
+    ys = positions(pixels.shape[0], tile_size, stride)
+    xs = positions(pixels.shape[1], tile_size, stride)
+    with METRICS.timed("field_filter"):
+        leafy = green_fractions(pixels, ys, xs, tile_size) >= min_green
+    tiles = [(int(row), int(col)) for row, col in zip(*np.nonzero(leafy))]
+
+    class_names = registry.class_names
+    tomato = tomato_mask(class_names)
+    diseased = disease_mask(class_names)
+    classes = np.full(leafy.shape, -1, dtype=np.int32)
+    confidences = np.zeros(leafy.shape, dtype=np.float32)
+    heatmap = np.full(leafy.shape, np.nan, dtype=np.float32)
+    buffer = BatchBuffer(min(batch_size, max(len(tiles), 1)))
+    model_version = registry.version
+    passes = 0
+    for chunk in chunked(tiles, len(buffer)):
+        for i, (row, col) in enumerate(chunk):
+            y, x = ys[row], xs[col]
+            resize_into(Image.fromarray(pixels[y:y + tile_size, x:x + tile_size]), buffer.array[i])
+        with METRICS.timed("field_inference"):
+            probs, model_version = registry.predict(buffer.view(len(chunk)))
+        passes += 1
+        for i, (row, col) in enumerate(chunk):
+            index = int(np.argmax(probs[i]))
+            classes[row, col] = index
+            confidences[row, col] = float(probs[i][index])
+            if tomato[index]:
+                heatmap[row, col] = float(probs[i][diseased].sum() / probs[i][tomato].sum())
+
+    height, width = pixels.shape[:2]
+    boxes = [(xs[col], ys[row], min(xs[col] + tile_size, width), min(ys[row] + tile_size, height)) for row, col in tiles]
+    summary = summarize(classes, confidences, class_names, tomato, diseased, passes)
+    return FieldAnalysis(image, tiles, boxes, classes, confidences, heatmap, summary, model_version)
+
+
+def summarize(classes, confidences, class_names, tomato, diseased, passes):
+    leaf_tiles = int((classes >= 0).sum())
+    counts = Counter(int(index) for index in classes[classes >= 0])
+    tomato_tiles = sum(count for index, count in counts.items() if tomato[index])
+    infected = sum(count for index, count in counts.items() if diseased[index])
+    diseases = sorted(
+        ((label_for(index, class_names), count) for index, count in counts.items() if diseased[index]),
+        key=lambda item: -item[1],
+    )
+    return {
+        "tiles": int(classes.size),
+        "leaf_tiles": leaf_tiles,
+        "skipped_tiles": int(classes.size) - leaf_tiles,
+        "tomato_tiles": tomato_tiles,
+        "unrecognised_tiles": leaf_tiles - tomato_tiles,
+        "infected_tiles": infected,
+        "infected_fraction": infected / tomato_tiles if tomato_tiles else 0.0,
+        "diseases": dict(diseases),
+        "dominant_disease": diseases[0][0] if diseases else None,
+        "mean_confidence": float(confidences[classes >= 0].mean()) if leaf_tiles else 0.0,
+        "forward_passes": passes,
+    }
+
+
+def heatmap_overlay(analysis, alpha=0.5):
+    """The analysed photo with each leafy region tinted from green (healthy) to red (diseased)."""
+    pixels = np.asarray(analysis.image).astype(np.float32)
+    heat = np.full(pixels.shape[:2], np.nan, dtype=np.float32)
+    for (row, col), (x0, y0, x1, y1) in zip(analysis.tiles, analysis.boxes):
+        # Overlapping tiles: the most diseased one wins.
+        region = heat[y0:y1, x0:x1]
+        np.fmax(region, analysis.heatmap[row, col], out=region)
+    covered = ~np.isnan(heat)
+    color = np.stack([255 * heat, 255 * (1 - heat), np.zeros_like(heat)], axis=-1)
+    pixels[covered] = (1 - alpha) * pixels[covered] + alpha * color[covered]
+    return Image.fromarray(pixels.astype(np.uint8))
@@ -0,0 +1,217 @@
+"""Headless HTTP inference service for the tomato leaf classifier.
+
+Run with ``python inference_server.py --port 8080`` and POST an image to
+``/predict`` (either as the raw request body or as a multipart ``image``
+field).  Concurrent requests are coalesced into batches: the batcher waits at
+most ``--max-wait-ms`` after the first queued image for more to arrive, up to
+``--max-batch-size``.  When ``--max-queue`` images are already waiting the
+server answers 503 with a Retry-After header instead of queueing more work.
+"""
+import argparse
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from aiohttp import web
+
+from class_labels import label_for
+from metrics import METRICS
+from model_registry import ENGINE_PATHS, get_registry
+from prediction_cache import digest, get_prediction_cache
+from preprocessing import MAX_UPLOAD_BYTES, BatchBuffer, load_image
+
+
+class QueueFull(Exception):
+    pass
+
+
+class DynamicBatcher:
+    def __init__(self, registry, max_batch_size=32, max_wait_ms=10.0, max_queue=256, executor=None):
+        self.registry = registry
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.executor = executor
+        # Only one batch is in flight at a time, so one buffer is enough.
+        self._buffer = BatchBuffer(max_batch_size)
+
+    def full(self):
+        return self.queue.full()
+
+    async def submit(self, array):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        try:
+            self.queue.put_nowait((array, future, loop.time()))
+        except asyncio.QueueFull:
+            raise QueueFull()
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        items = [await self.queue.get()]
+        # The wait budget runs from when the oldest request was queued, which
+        # may have been during the previous forward pass.
+        deadline = items[0][2] + self.max_wait
+        while len(items) < self.max_batch_size:
+            if not self.queue.empty():
+                items.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return items
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            batch = np.stack([array for array, _, _ in items], out=self._buffer.view(len(items)))
+            try:
+                predictions, version = await loop.run_in_executor(self.executor, self.registry.predict, batch)
+            except Exception as e:
+                for _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future, _), probs in zip(items, predictions):
+                if not future.done():
+                    future.set_result((probs, version))
+
+
+def format_prediction(probs, version, top_k, class_names):
+    order = np.argsort(probs)[::-1][:top_k]
+    top = [
+        {"class": label_for(int(i), class_names) or f"Class {int(i)}", "class_index": int(i), "confidence": float(probs[i])}
+        for i in order
+    ]
+    return {
+        "class": top[0]["class"],
+        "class_index": top[0]["class_index"],
+        "confidence": top[0]["confidence"],
+        "top_k": top,
+        "model_version": version,
+    }
+
+
+async def _read_image_bytes(request):
+    if request.content_type.startswith("multipart/"):
+        reader = await request.multipart()
+        async for part in reader:
+            if part.name == "image":
+                return await part.read()
+        return None
+    return await request.read()
+
+
+async def handle_predict(request):
+    METRICS.inc("requests_total", path="api")
+    with METRICS.timed("api_request"):
+        return await _predict(request)
+
+
+async def _predict(request):
+    app = request.app
+    batcher = app["batcher"]
+    if batcher.full():
+        return _busy()
+    try:
+        top_k = max(1, int(request.query.get("top_k", 3)))
+    except ValueError:
+        return web.json_response({"error": "top_k must be an integer"}, status=400)
+    data = await _read_image_bytes(request)
+    if not data:
+        return web.json_response({"error": "no image in request body"}, status=400)
+    cache = app["cache"]
+    source_key = digest(data)
+    version = app["registry"].version
+    probs = cache.get_source(source_key, version)
+    cache.record(hit=probs is not None)
+    if probs is not None:
+        return web.json_response(format_prediction(probs, version, top_k, app["registry"].class_names))
+    loop = asyncio.get_running_loop()
+    try:
+        array = await loop.run_in_executor(app["decode_pool"], load_image, data)
+    except Exception as e:
+        return web.json_response({"error": f"could not decode image: {e}"}, status=400)
+    try:
+        probs, version = await batcher.submit(array)
+    except QueueFull:
+        return _busy()
+    except Exception as e:
+        METRICS.inc("errors_total", stage="api_request")
+        return web.json_response({"error": f"prediction failed: {e}"}, status=500)
+    cache.put(digest(array), version, probs, source_key)
+    return web.json_response(format_prediction(probs, version, top_k, app["registry"].class_names))
+
+
+async def handle_health(request):
+    app = request.app
+    return web.json_response({
+        "status": "ok",
+        "model_version": app["registry"].version,
+        "queue_depth": app["batcher"].queue.qsize(),
+    })
+
+
+async def handle_metrics(request):
+    return web.Response(text=METRICS.prometheus_text(), content_type="text/plain", charset="utf-8")
+
+
+def _busy():
+    METRICS.inc("rejected_total", path="api")
+    return web.json_response({"error": "server busy, retry later"}, status=503, headers={"Retry-After": "1"})
+
+
+def create_app(model_path=None, max_batch_size=32, max_wait_ms=10.0, max_queue=256, decode_workers=None, engine=None, num_threads=None):
+    app = web.Application(client_max_size=MAX_UPLOAD_BYTES)
+
+    async def on_startup(app):
+        loop = asyncio.get_running_loop()
+        app["cache"] = get_prediction_cache()
+        app["decode_pool"] = ThreadPoolExecutor(max_workers=decode_workers or min(8, os.cpu_count() or 1))
+        app["inference_pool"] = ThreadPoolExecutor(max_workers=1)
+        # Load and warm the model before accepting traffic.
+        app["registry"] = await loop.run_in_executor(app["inference_pool"], get_registry, model_path, engine, num_threads)
+        app["cache"].watch(app["registry"])
+        app["batcher"] = DynamicBatcher(app["registry"], max_batch_size, max_wait_ms, max_queue, app["inference_pool"])
+        app["batcher_task"] = asyncio.create_task(app["batcher"].run())
+
+    async def on_cleanup(app):
+        app["batcher_task"].cancel()
+        app["decode_pool"].shutdown(wait=False)
+        app["inference_pool"].shutdown(wait=False)
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/predict", handle_predict)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the tomato leaf disease model over HTTP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--model", help="model file; defaults to the file for --engine")
+    parser.add_argument("--engine", choices=sorted(ENGINE_PATHS))
+    parser.add_argument("--threads", type=int, help="TFLite interpreter threads")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--max-queue", type=int, default=256)
+    parser.add_argument("--decode-workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    app = create_app(
+        args.model, args.max_batch_size, args.max_wait_ms, args.max_queue, args.decode_workers, args.engine, args.threads
+    )
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
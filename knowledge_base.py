@@ -0,0 +1,125 @@
+"""Disease guide indexed by model output.
+
+tomato_disease_guide_detailed.csv is read once per process.  Building a
+``KnowledgeBase`` checks that the class names, the guide rows and the
+mapping between them line up, then indexes the guide by class index so a
+prediction needs only a dictionary lookup.  Translated guide text and the
+downloadable report are rendered once per language and kept.
+"""
+import csv
+import os
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+from class_labels import display_name
+
+GUIDE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tomato_disease_guide_detailed.csv")
+
+# Model class -> "Disease" value of its row in the guide CSV.
+GUIDE_ROWS = {
+    "Tomato___Bacterial_spot": "Tomato Bacterial Spot",
+    "Tomato___Early_blight": "Tomato  Early blight",
+    "Tomato___Late_blight": "Tomato Late Blight",
+    "Tomato___Leaf_Mold": "Tomato Leaf Mold",
+    "Tomato___Septoria_leaf_spot": "Tomato Septoria leaf Spot",
+    "Tomato___Spider_mites Two-spotted_spider_mite": "Tomato Spider Mites",
+    "Tomato___Target_Spot": "Tomato Target Spot",
+    "Tomato___Tomato_Yellow_Leaf_Curl_Virus": "Tomato_Yellow_Leaf_Curl_Virus",
+    "Tomato___Tomato_mosaic_virus": "Tomato Mosaic Virus",
+    "Tomato___healthy": "Tomato Healthy",
+}
+
+# Headings of the guide fields and the report, translated with the entries.
+HEADINGS = ["Disease", "Symptoms", "Organic Pesticides", "Tips"]
+
+GuideEntry = namedtuple("GuideEntry", ["label", "symptoms", "organic_pesticides", "tips", "report"])
+
+
+class KnowledgeBaseError(ValueError):
+    pass
+
+
+def read_guide(path=GUIDE_CSV):
+    with open(path, encoding="utf-8", newline="") as f:
+        return {row["Disease"]: row for row in csv.DictReader(f)}
+
+
+def validate(class_names, guide, guide_rows=GUIDE_ROWS):
+    problems = []
+    if len(set(class_names)) != len(class_names):
+        problems.append("class names are not unique")
+    for class_name, disease in guide_rows.items():
+        if disease not in guide:
+            problems.append(f"{class_name} maps to {disease!r}, which is not a row of the guide")
+    for class_name in class_names:
+        if class_name.startswith("Tomato___") and class_name not in guide_rows:
+            problems.append(f"tomato class {class_name} has no guide row")
+    unmapped = set(guide) - set(guide_rows.values())
+    if unmapped:
+        problems.append(f"guide rows not reachable from any class: {sorted(unmapped)}")
+    if problems:
+        raise KnowledgeBaseError("; ".join(problems))
+
+
+def _identity(text):
+    return text
+
+
+class KnowledgeBase:
+    def __init__(self, class_names, guide=None, guide_rows=GUIDE_ROWS):
+        guide = read_guide() if guide is None else guide
+        validate(class_names, guide, guide_rows)
+        self.class_names = list(class_names)
+        self.labels = {i: display_name(name) for i, name in enumerate(class_names)}
+        self._rows = {
+            i: guide[guide_rows[name]] for i, name in enumerate(class_names) if name in guide_rows
+        }
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    def label(self, index):
+        return self.labels.get(index)
+
+    def is_tomato(self, index):
+        return index in self._rows
+
+    def _render(self, translate):
+        headings = {heading: translate(heading) for heading in HEADINGS}
+        rendered = {}
+        for index, row in self._rows.items():
+            label = translate(self.labels[index])
+            symptoms = translate(row["Symptoms"])
+            pesticides = translate(row["Organic Pesticides"])
+            tips = translate(row["Tips"])
+            report = (
+                f"{headings['Disease']}: {label}\n"
+                f"{headings['Symptoms']}: {symptoms}\n"
+                f"{headings['Organic Pesticides']}: {pesticides}\n"
+                f"{headings['Tips']}: {tips}"
+            )
+            rendered[index] = GuideEntry(label, symptoms, pesticides, tips, report)
+        return rendered
+
+    def entry(self, index, language="en", translate=None):
+        """Guide entry for a class index in ``language``, or None for non-tomato classes.
+
+        The first call per language renders every entry with ``translate``;
+        later calls are a dictionary lookup.
+        """
+        rendered = self._rendered.get(language)
+        if rendered is None:
+            with self._lock:
+                rendered = self._rendered.get(language)
+                if rendered is None:
+                    rendered = self._rendered[language] = self._render(translate or _identity)
+        return rendered.get(index)
+
+
+@lru_cache(maxsize=None)
+def _knowledge_base(class_names):
+    return KnowledgeBase(class_names)
+
+
+def get_knowledge_base(class_names):
+    return _knowledge_base(tuple(class_names))
@@ -1,40 +1,37 @@
-import tensorflow as tf
-import numpy as np
-import pandas as pd
 import streamlit as st
-import requests
-import random
-from deep_translator import GoogleTranslator
-from PIL import Image
+import os
+import threading
+from metrics import METRICS
+from translation_cache import LANGUAGE_CODES, Translator
 # Language support
 selected_language = st.sidebar.selectbox("🌍 Choose Language", ["English", "Telugu"])
+# Language packs + persistent cache, shared by every session
+@st.cache_resource
+def get_translator():
+    return Translator.default()
 def translate_text(text):
     try:
         if selected_language == "Telugu":
-            return GoogleTranslator(source="auto", target="te").translate(text)
+            return get_translator().translate(text, LANGUAGE_CODES[selected_language])
         return text
     except Exception as e:
         st.error(f"Translation Error: {e}")
         return text
-def model_prediction(test_image):
-    try:
-        # Load the trained model
-        model = tf.keras.models.load_model("trained_plant_disease_model.keras")
-        # Process the uploaded image
-        image = Image.open(test_image).convert("RGB")  # Convert to RGB
-        image = image.resize((128, 128))  # Resize to match model input
-        input_arr = np.array(image)  # Convert image to array
-        input_arr = np.expand_dims(input_arr, axis=0)  # Convert to batch format
-        predictions = model.predict(input_arr)
-        result_index = np.argmax(predictions)  # Get highest confidence prediction
-        confidence = np.max(predictions) * 100  # Convert to percentage
-        return result_index, confidence
-    except Exception as e:
-        st.error(f"Model Prediction Error: {e}")
-        return None, None
+# Load TensorFlow, the model and the disease guide off the script thread, once per process
+@st.cache_resource
+def start_background_warm_up():
+    def _warm_up():
+        import detection_page
+        detection_page.warm_up()
+    thread = threading.Thread(target=_warm_up, name="detection-warm-up", daemon=True)
+    thread.start()
+    return thread
 # Sidebar Navigation
 st.sidebar.title((" Tomato Leaf Disease Detection System"))
-page = st.sidebar.radio(("Navigation"), [("Home"), ("Disease Detection"), ("Tomato Care Guide"), ("Chatbot")])
+# Admin-only metrics page: set PERFORMANCE_PAGE_TOKEN and open the app with ?admin=<token>
+admin_token = os.environ.get("PERFORMANCE_PAGE_TOKEN")
+show_performance = bool(admin_token) and st.query_params.get("admin") == admin_token
+page = st.sidebar.radio(("Navigation"), [("Home"), ("Disease Detection"), ("Tomato Care Guide"), ("Chatbot")] + (["Performance"] if show_performance else []))
 # Home Page
 if page == translate_text("Home"):
     st.markdown(f"<h1 style='text-align: center;'>{translate_text('Tomato Leaf Disease Detection System')}</h1>", unsafe_allow_html=True)
@@ -50,49 +47,12 @@ if page == translate_text("Home"):
     """))
 # Prediction Page
 elif page == "Disease Detection":
-    st.header(translate_text("Upload a Plant Leaf Image"))
-    test_image = st.file_uploader("Choose an Image:", type=["jpg", "png", "jpeg"])
-    if test_image:
-        st.image(test_image, caption="Uploaded Image", use_column_width=True)
-        if st.button("Predict"):
-            with st.spinner(" Analyzing Image... Please wait."):
-                result_index, confidence = model_prediction(test_image)
-            class_labels = [
-                'Tomato Bacterial Spot', 'Tomato  Early blight','Tomato Healthy', 'Tomato Late Blight','Tomato Leaf Mold','Tomato Septoria leaf Spot'
-                'Tomato Spider Mites','Tomato Target Spot', 'Tomato Mosaic Virus', 'Tomato_Yellow_Leaf_Curl_Virus', 'Tomato___healthy'
-            ]
-            if result_index is not None and 0 <= result_index < len(class_labels):
-                predicted_disease = class_labels[result_index]
-                st.success(f"✅ {translate_text('Model Prediction')}: {translate_text(predicted_disease)} ({confidence:.2f}% Confidence)")
-                # Load fertilizer and pesticide recommendations
-                df_path = "C:/project/Leaf Disease Detection/tomato_disease_guide_detailed.csv"
-                try:
-                    df = pd.read_csv(df_path)
-                except FileNotFoundError:
-                    st.error(f"Error: The file {df_path} was not found.")
-                    df = pd.DataFrame()
-                except Exception as e:
-                    st.error(f"Error loading CSV file: {e}")
-                    df = pd.DataFrame()
-                # Fetch disease info from the CSV file
-                disease_info = df[df["Disease"] == predicted_disease]
-                if not disease_info.empty:
-                    disease_info = disease_info.iloc[0]
-                    st.info(f"🌿 {translate_text('Symptoms')}: {translate_text(str(disease_info['Symptoms']))}")
-                    st.warning(f"🐞 {translate_text('Organic Pesticides')}: {translate_text(str(disease_info['Organic Pesticides']))}")
-                    st.success(f"💡 {translate_text('Tips')}: {translate_text(str(disease_info['Tips']))}")
-                    # Allow users to download the report
-                    report_text = (
-                        f"Disease: {predicted_disease}\n"
-                        f"Fertilizer: {disease_info['Symptoms']}\n"
-                        f"Pesticide: {disease_info['Organic Pesticides']}\n"
-                        f"Tips: {disease_info['Tips']}"
-                    )
-                    st.download_button(label=translate_text("📄 Download Report"), data=report_text, file_name="plant_disease_report.txt")
-                else:
-                    st.error(f"It's not a tomato,It's a: {predicted_disease},can i suggest a pesticide for only a Tomato leaf diseases.")
-            else:
-                st.error("Upload a Tomato leaf with a clarity.It's not clear tomato leaf image so model could not make a valid prediction. Please try again with clear image.")
+    # Heavy dependencies (NumPy, Pillow, TensorFlow) load only for this page
+    import detection_page
+    # The model warms up while the user picks an image
+    start_background_warm_up()
+    language = LANGUAGE_CODES[selected_language]
+    detection_page.render(translate_text, language, lambda text: get_translator().translate(text, language))
 # Tomato Care Guide Page
 elif page == "Tomato Care Guide":
     st.markdown("## 🌿 Tomato Care Guide")
@@ -356,7 +316,8 @@ elif page == "Chatbot":
         "What image formats are supported?": "The system supports JPEG, PNG, and JPG file formats.",
         "What is the maximum file size for image uploads?": "You can upload images up to 20MB in size.",
         "Can I take a live photo for detection?": "Yes, if you are using a mobile device, you can take a live photo and upload it directly for analysis.",
-        "Can I upload multiple images at once?": "Currently, the system processes one image at a time. Future updates may support batch processing.",
+        "Can I upload multiple images at once?": "Yes. Switch the Disease Detection page to Batch mode and upload several images or a zip archive; results are shown in a table and can be downloaded as a CSV report.",
+        "Can I analyze a photo of a whole plant or field?": "Yes. Choose Field Photo on the Disease Detection page; the photo is checked tile by tile and a heatmap shows which areas look diseased.",
         "Does image background affect detection?": "Yes, a cluttered background may reduce accuracy. It is recommended to take a close-up of the leaf with a plain background."
     },
     "Accuracy & Confidence": {
@@ -386,7 +347,7 @@ elif page == "Chatbot":
         "Can I provide feedback on the system?": "Yes! Your feedback is valuable. You can share your thoughts through the feedback section in the app.",
         "Is there a community or forum for users?": "Yes, we are working on creating an online community where users can share experiences and get expert advice.",
         "Will AI-generated recommendations improve over time?": "Yes, as the system learns from new data, treatment recommendations will become more precise and effective.",
-        "Can I integrate this system into my own farming tools?": "We are working on an API for third-party integration. Stay tuned for updates!"
+        "Can I integrate this system into my own farming tools?": "Yes. Run inference_server.py to start the HTTP API, then POST a leaf image to /predict to get the predicted class, confidence and top matches as JSON."
     }
 }
     # Sidebar category selection
@@ -397,4 +358,20 @@ elif page == "Chatbot":
         
         if selected_question:
             st.write("**Answer:**", 
-            chatbot_data[selected_category][selected_question])
\ No newline at end of file
+            chatbot_data[selected_category][selected_question])
+# Performance Page (admin only)
+elif page == "Performance":
+    st.header("📈 Performance")
+    model_info = METRICS.info().get("model_info", {})
+    st.write(f"**Model version:** {model_info.get('version', 'not loaded yet')}")
+    from prediction_cache import get_prediction_cache
+    cache_stats = get_prediction_cache().stats()
+    st.write(f"**Prediction cache:** {cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate), {cache_stats['entries']} entries")
+    st.subheader("Stage Latency")
+    st.dataframe(METRICS.stage_summary(), use_container_width=True)
+    st.subheader("Counters")
+    st.dataframe(METRICS.counter_summary(), use_container_width=True)
+    st.download_button(label="Download Prometheus Metrics", data=METRICS.prometheus_text(), file_name="metrics.prom", mime="text/plain")
+# Static-only processes never load TensorFlow unless WARM_UP_ON_START=1
+if os.environ.get("WARM_UP_ON_START") == "1":
+    start_background_warm_up()
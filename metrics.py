@@ -0,0 +1,154 @@
+"""In-process latency histograms and counters for the detection pipeline.
+
+Wrap a stage in ``with METRICS.timed("decode"):`` and count events with
+``METRICS.inc("requests_total", path="single")``.  Each (stage, labels)
+pair keeps a ring of its most recent samples, from which p50/p95/p99 are
+computed only when someone reads them, so recording is an append plus a
+couple of additions.  ``prometheus_text`` renders everything in the
+Prometheus text exposition format.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+WINDOW = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = "tomato"
+
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        # deque.append is atomic; the totals may drift by a sample under
+        # contention, which is acceptable for monitoring.
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self, quantiles=QUANTILES):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in quantiles}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in quantiles}
+
+
+class Metrics:
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.started = time.time()
+        self._histograms = {}
+        self._counters = {}
+        self._info = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, stage, labels):
+        key = (stage, _labels_key(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(self.window))
+        return histogram
+
+    def observe(self, stage, seconds, **labels):
+        self._histogram(stage, labels).observe(seconds)
+
+    @contextmanager
+    def timed(self, stage, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("errors_total", stage=stage)
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_info(self, name, **labels):
+        # Info-style gauge: the latest label set is exported with value 1.
+        with self._lock:
+            self._info[name] = _labels_key(labels)
+
+    def _histogram_items(self):
+        with self._lock:
+            return sorted(self._histograms.items())
+
+    def stage_summary(self):
+        rows = []
+        for (stage, labels), histogram in self._histogram_items():
+            q = histogram.quantiles()
+            rows.append({
+                "stage": stage,
+                "labels": ", ".join(f"{k}={v}" for k, v in labels),
+                "count": histogram.count,
+                "p50_ms": round(1000 * q[0.5], 3),
+                "p95_ms": round(1000 * q[0.95], 3),
+                "p99_ms": round(1000 * q[0.99], 3),
+                "mean_ms": round(1000 * histogram.total / histogram.count, 3) if histogram.count else 0.0,
+            })
+        return rows
+
+    def counter_summary(self):
+        with self._lock:
+            items = sorted(self._counters.items())
+        return [{"counter": name, "labels": ", ".join(f"{k}={v}" for k, v in labels), "value": value}
+                for (name, labels), value in items]
+
+    def info(self):
+        with self._lock:
+            return {name: dict(labels) for name, labels in self._info.items()}
+
+    def prometheus_text(self):
+        lines = []
+        metric = f"{PREFIX}_stage_latency_seconds"
+        lines.append(f"# HELP {metric} Latency of each pipeline stage over the last {self.window} samples.")
+        lines.append(f"# TYPE {metric} summary")
+        for (stage, labels), histogram in self._histogram_items():
+            base = (("stage", stage),) + labels
+            for q, value in histogram.quantiles().items():
+                lines.append(f"{metric}{_format_labels(base + (('quantile', str(q)),))} {value:.6f}")
+            lines.append(f"{metric}_sum{_format_labels(base)} {histogram.total:.6f}")
+            lines.append(f"{metric}_count{_format_labels(base)} {histogram.count}")
+        with self._lock:
+            counters = sorted(self._counters.items())
+            info = sorted(self._info.items())
+        typed = set()
+        for (name, labels), value in counters:
+            full = f"{PREFIX}_{name}"
+            if full not in typed:
+                lines.append(f"# TYPE {full} counter")
+                typed.add(full)
+            lines.append(f"{full}{_format_labels(labels)} {value}")
+        for name, labels in info:
+            lines.append(f"# TYPE {PREFIX}_{name} gauge")
+            lines.append(f"{PREFIX}_{name}{_format_labels(labels)} 1")
+        lines.append(f"# TYPE {PREFIX}_uptime_seconds gauge")
+        lines.append(f"{PREFIX}_uptime_seconds {time.time() - self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every Streamlit session and server request in the process.
+METRICS = Metrics()
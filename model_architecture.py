@@ -0,0 +1,59 @@
+"""Keras definitions of the leaf classifiers.
+
+``build_plant_cnn`` is the network trained in Train_plant_disease.
+``build_student`` is the compact model distill_student.py trains from it.
+"""
+INPUT_SHAPE = (128, 128, 3)
+NUM_CLASSES = 38
+
+
+def build_plant_cnn(num_classes=NUM_CLASSES, input_shape=INPUT_SHAPE):
+    # Same layers as the training notebook; weights start random.
+    import tensorflow as tf
+    layers = tf.keras.layers
+    cnn = tf.keras.models.Sequential([tf.keras.Input(shape=input_shape)])
+    for filters in (32, 64, 128, 256, 512):
+        cnn.add(layers.Conv2D(filters=filters, kernel_size=3, padding="same", activation="relu"))
+        cnn.add(layers.Conv2D(filters=filters, kernel_size=3, activation="relu"))
+        cnn.add(layers.MaxPool2D(pool_size=2, strides=2))
+    cnn.add(layers.Dropout(0.25))
+    cnn.add(layers.Flatten())
+    cnn.add(layers.Dense(units=1500, activation="relu"))
+    cnn.add(layers.Dropout(0.4))
+    cnn.add(layers.Dense(units=num_classes, activation="softmax"))
+    return cnn
+
+
+def build_student(num_classes, input_shape=INPUT_SHAPE, width=1.0, dropout=0.2):
+    # Depthwise-separable blocks and a global-pooling head instead of the
+    # teacher's Flatten -> Dense(1500). ``width`` scales every block.
+    import tensorflow as tf
+    layers = tf.keras.layers
+    filters = lambda n: max(8, int(n * width))
+    student = tf.keras.models.Sequential([tf.keras.Input(shape=input_shape), layers.Rescaling(1.0 / 255)])
+    student.add(layers.Conv2D(filters(32), kernel_size=3, strides=2, padding="same", use_bias=False))
+    student.add(layers.BatchNormalization())
+    student.add(layers.ReLU())
+    for n in (64, 128, 256, 512):
+        student.add(layers.SeparableConv2D(filters(n), kernel_size=3, padding="same", use_bias=False))
+        student.add(layers.BatchNormalization())
+        student.add(layers.ReLU())
+        student.add(layers.SeparableConv2D(filters(n), kernel_size=3, strides=2, padding="same", use_bias=False))
+        student.add(layers.BatchNormalization())
+        student.add(layers.ReLU())
+    student.add(layers.GlobalAveragePooling2D())
+    student.add(layers.Dropout(dropout))
+    # Logits and softmax are separate layers so distillation can soften the logits.
+    student.add(layers.Dense(units=num_classes, name="logits"))
+    student.add(layers.Softmax())
+    return student
+
+
+def compile_plant_cnn(cnn, learning_rate=0.0001):
+    import tensorflow as tf
+    cnn.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss="categorical_crossentropy",
+        metrics=["accuracy"],
+    )
+    return cnn
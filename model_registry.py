@@ -0,0 +1,298 @@
+"""Process-wide registry for the disease classifier.
+
+Streamlit re-runs main.py for every interaction, but imported modules live for
+the whole process, so the registry below is shared by every session.  Each
+model version is deserialized once, warmed up with a dummy batch and then
+served until a new file lands at the same path.  New versions are loaded in a
+background thread and swapped in with a single reference assignment, so
+predictions that already hold the old model finish on it undisturbed.
+
+Publish a new model by writing it next to the old one and ``os.replace``-ing
+it over ``trained_plant_disease_model.keras``.
+
+Besides the Keras model, the float16 and int8 TFLite exports written by
+convert_tflite.py and the tomato-only student model written by
+distill_student.py can serve predictions.  Pick one with the ``engine``
+argument or the ``MODEL_ENGINE`` environment variable, and set the
+interpreter thread count with ``TFLITE_NUM_THREADS``.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from class_labels import load_class_names
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = "trained_plant_disease_model.keras"
+ENGINE_PATHS = {
+    "keras": DEFAULT_MODEL_PATH,
+    "float16": "trained_plant_disease_model_float16.tflite",
+    "int8": "trained_plant_disease_model_int8.tflite",
+    "student": "tomato_student_model.keras",
+}
+DEFAULT_ENGINE = os.environ.get("MODEL_ENGINE", "keras")
+DEFAULT_NUM_THREADS = int(os.environ["TFLITE_NUM_THREADS"]) if os.environ.get("TFLITE_NUM_THREADS") else None
+INPUT_SHAPE = (128, 128, 3)
+CHECK_INTERVAL = 5.0
+
+
+def file_version(path):
+    # Short content hash: identical bytes always map to the same version.
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+class KerasEngine:
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, batch):
+        # Calling the model directly skips the per-call dataset/iterator setup
+        # of ``model.predict`` and is safe to use from several threads.
+        return np.asarray(self.model(batch, training=False))
+
+
+def padded_batch_size(count):
+    # Next power of two, so a handful of interpreter shapes cover every batch.
+    return 1 << max(count - 1, 0).bit_length()
+
+
+class TFLiteEngine:
+    """TFLite interpreter per padded batch size.
+
+    Resizing one interpreter re-runs ``allocate_tensors``, which would happen
+    on every switch between single images, full batches and the last partial
+    batch.  Instead batches are zero-padded to the next power of two and each
+    size keeps its own interpreter (the model file itself is memory-mapped
+    and shared).
+    """
+
+    def __init__(self, path, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self._new_interpreter = lambda: Interpreter(model_path=path, num_threads=num_threads)
+        self._interpreters = {}
+        self._lock = threading.Lock()
+        self._interpreter(1)
+
+    def _interpreter(self, batch_size):
+        with self._lock:
+            entry = self._interpreters.get(batch_size)
+            if entry is None:
+                interpreter = self._new_interpreter()
+                index = interpreter.get_input_details()[0]["index"]
+                interpreter.resize_tensor_input(index, [batch_size] + list(INPUT_SHAPE))
+                interpreter.allocate_tensors()
+                # One interpreter is not re-entrant; concurrent callers take turns.
+                entry = self._interpreters[batch_size] = (
+                    interpreter,
+                    interpreter.get_input_details()[0],
+                    interpreter.get_output_details()[0],
+                    threading.Lock(),
+                )
+            return entry
+
+    def predict(self, batch):
+        count = batch.shape[0]
+        size = padded_batch_size(count)
+        if size != count:
+            padded = np.zeros((size,) + batch.shape[1:], dtype=batch.dtype)
+            padded[:count] = batch
+            batch = padded
+        interpreter, input_details, output_details, lock = self._interpreter(size)
+        dtype = input_details["dtype"]
+        if np.issubdtype(dtype, np.integer):
+            # Fully integer model: quantize the raw 0-255 pixels ourselves.
+            scale, zero_point = input_details["quantization"]
+            info = np.iinfo(dtype)
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+        with lock:
+            interpreter.set_tensor(input_details["index"], batch.astype(dtype))
+            interpreter.invoke()
+            output = interpreter.get_tensor(output_details["index"])[:count]
+        if np.issubdtype(output.dtype, np.integer):
+            scale, zero_point = output_details["quantization"]
+            return (output.astype(np.float32) - zero_point) * scale
+        return output.copy()
+
+
+def load_keras_model(path):
+    import tensorflow as tf
+    return KerasEngine(tf.keras.models.load_model(path))
+
+
+def load_engine(path, num_threads=None):
+    if path.endswith(".tflite"):
+        return TFLiteEngine(path, num_threads)
+    return load_keras_model(path)
+
+
+class LoadedModel:
+    def __init__(self, engine, version, path, class_names):
+        self.engine = engine
+        self.version = version
+        self.path = path
+        self.class_names = class_names
+        self.loaded_at = time.time()
+
+    def predict(self, batch):
+        return self.engine.predict(batch)
+
+    def warm_up(self):
+        outputs = self.predict(np.zeros((1,) + INPUT_SHAPE, dtype=np.float32)).shape[-1]
+        if outputs != len(self.class_names):
+            raise ValueError(
+                f"{self.path} has {outputs} outputs but {len(self.class_names)} class names; "
+                "ship a matching _classes.json next to the model"
+            )
+
+
+class ModelRegistry:
+    def __init__(self, path=DEFAULT_MODEL_PATH, loader=load_engine, check_interval=CHECK_INTERVAL):
+        self.path = path
+        self.loader = loader
+        self.check_interval = check_interval
+        self._current = None
+        self._stat = None
+        self._failed_stat = None
+        self._last_check = 0.0
+        self._load_lock = threading.Lock()
+        self._reloading = False
+        self._listeners = []
+
+    def _load(self):
+        # Retry while the file changes underneath us: a half-copied model is
+        # never published.
+        while True:
+            before = _stat_key(self.path)
+            version = file_version(self.path)
+            current = self._current
+            if current is not None and current.version == version:
+                self._stat = before
+                return current
+            with METRICS.timed("model_load"):
+                loaded = LoadedModel(self.loader(self.path), version, self.path, load_class_names(self.path))
+            if _stat_key(self.path) == before:
+                with METRICS.timed("warm_up"):
+                    loaded.warm_up()
+                self._stat = before
+                METRICS.inc("model_loads_total")
+                return loaded
+
+    def start(self):
+        with self._load_lock:
+            if self._current is None:
+                self._publish(self._load())
+                self._last_check = time.monotonic()
+        return self._current
+
+    def subscribe(self, listener):
+        # ``listener(old_version, new_version)`` runs after a new version is published.
+        self._listeners.append(listener)
+
+    def _publish(self, loaded):
+        previous = self._current
+        self._current = loaded
+        METRICS.set_info("model_info", version=loaded.version, path=loaded.path)
+        if previous is not None and previous.version != loaded.version:
+            for listener in list(self._listeners):
+                listener(previous.version, loaded.version)
+
+    def _reload_in_background(self, stat):
+        try:
+            self._publish(self._load())
+            self._failed_stat = None
+        except Exception:
+            # Keep serving the previous version and leave this file alone
+            # until it changes again.
+            self._failed_stat = stat
+            METRICS.inc("model_load_failures_total")
+            logger.exception("Could not load %s; still serving version %s", self.path,
+                             self._current.version if self._current else None)
+        finally:
+            self._reloading = False
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        with self._load_lock:
+            if self._reloading or now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+            try:
+                stat = _stat_key(self.path)
+            except OSError:
+                return
+            if stat != self._stat and stat != self._failed_stat:
+                self._reloading = True
+                threading.Thread(target=self._reload_in_background, args=(stat,), daemon=True).start()
+
+    def current(self):
+        if self._current is None:
+            return self.start()
+        self._maybe_reload()
+        return self._current
+
+    @property
+    def version(self):
+        return self.current().version
+
+    @property
+    def class_names(self):
+        return self.current().class_names
+
+    def predict(self, batch):
+        # Grab the model once so a concurrent swap cannot mix versions.
+        model = self.current()
+        with METRICS.timed("inference", model_version=model.version):
+            predictions = model.predict(batch)
+        METRICS.inc("images_total", len(batch), model_version=model.version)
+        return predictions, model.version
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(path=None, engine=None, num_threads=None):
+    path = path or ENGINE_PATHS[engine or DEFAULT_ENGINE]
+    num_threads = num_threads or DEFAULT_NUM_THREADS
+    key = (path, num_threads)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            loader = lambda p: load_engine(p, num_threads)
+            registry = _registries[key] = ModelRegistry(path, loader)
+    registry.start()
+    return registry
+
+
+def warm_up_in_background(path=None, engine=None, num_threads=None):
+    # Load and warm the model off the request thread; errors surface on the
+    # first real prediction instead.
+    def _warm():
+        try:
+            get_registry(path, engine, num_threads)
+        except Exception:
+            pass
+    thread = threading.Thread(target=_warm, name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
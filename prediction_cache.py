@@ -0,0 +1,188 @@
+"""Content-addressed cache of model outputs.
+
+Entries are keyed by a hash of the decoded 128x128 pixels together with the
+model version, so a re-upload of the same photo (even re-encoded or renamed)
+skips inference.  Each upload's raw bytes hash is also remembered as an alias
+of its pixel hash, which lets an identical file skip decoding as well.
+
+The in-memory tier is an LRU capped by bytes.  An optional SQLite tier keeps
+results across restarts.  The model version is part of every key, so a
+hot-reloaded model never serves stale predictions and several engines can
+share one cache.  When a watched registry publishes a new version, the
+entries of its old version are dropped; anything else ages out of the LRU.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import METRICS
+from preprocessing import load_image
+from sqlite_lru import SQLiteLRU
+
+MAX_MEMORY_BYTES = 32 * 1024 * 1024
+MAX_DISK_ENTRIES = 100000
+MAX_ALIASES = 65536
+# Rough per-entry cost of the key, OrderedDict slot and ndarray header.
+ENTRY_OVERHEAD = 256
+
+
+def digest(data):
+    if isinstance(data, np.ndarray):
+        data = np.ascontiguousarray(data).data
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def source_bytes(source):
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    position = source.tell()
+    data = source.read()
+    source.seek(position)
+    return data
+
+
+class DiskTier:
+    def __init__(self, path, max_entries=MAX_DISK_ENTRIES):
+        self._store = SQLiteLRU(path, "predictions", ["key", "version"], "probs", "BLOB", max_entries)
+
+    def get(self, key, version):
+        probs = self._store.get((key, version))
+        return None if probs is None else np.frombuffer(probs, dtype=np.float32).copy()
+
+    def put(self, key, version, probs):
+        self._store.put((key, version), np.asarray(probs, dtype=np.float32).tobytes())
+
+    def drop_version(self, version):
+        self._store.delete("version", version)
+
+
+class PredictionCache:
+    def __init__(self, max_bytes=MAX_MEMORY_BYTES, disk_path=None, max_disk_entries=MAX_DISK_ENTRIES):
+        self.max_bytes = max_bytes
+        self.disk = DiskTier(disk_path, max_disk_entries) if disk_path else None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._aliases = OrderedDict()
+        self._bytes = 0
+        self._watched = set()
+        self._lock = threading.Lock()
+
+    def watch(self, registry):
+        # Drop a registry's old entries as soon as it publishes a new version.
+        with self._lock:
+            if id(registry) in self._watched:
+                return
+            self._watched.add(id(registry))
+        registry.subscribe(lambda old_version, new_version: self.retire(old_version))
+
+    def retire(self, version):
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == version]:
+                self._bytes -= self._entries.pop(entry_key).nbytes + ENTRY_OVERHEAD
+        if self.disk is not None:
+            self.disk.drop_version(version)
+
+    def get(self, key, version):
+        with self._lock:
+            probs = self._entries.get((version, key))
+            if probs is not None:
+                self._entries.move_to_end((version, key))
+                return probs
+        if self.disk is not None:
+            probs = self.disk.get(key, version)
+            if probs is not None:
+                self._remember(key, version, probs)
+        return probs
+
+    def get_source(self, source_key, version):
+        # Aliases map raw bytes to pixel hashes, which do not depend on the model.
+        with self._lock:
+            key = self._aliases.get(source_key)
+        return self.get(key, version) if key is not None else None
+
+    def put(self, key, version, probs, source_key=None):
+        # Callers pass rows of a batch output; a view would keep the whole
+        # batch alive while only the row is counted against max_bytes.
+        probs = np.array(probs, dtype=np.float32, copy=True)
+        self._remember(key, version, probs, source_key)
+        if self.disk is not None:
+            self.disk.put(key, version, probs)
+
+    def _remember(self, key, version, probs, source_key=None):
+        with self._lock:
+            if source_key is not None:
+                self._aliases[source_key] = key
+                self._aliases.move_to_end(source_key)
+                if len(self._aliases) > MAX_ALIASES:
+                    self._aliases.popitem(last=False)
+            entry_key = (version, key)
+            if entry_key in self._entries:
+                self._entries.move_to_end(entry_key)
+                return
+            self._entries[entry_key] = probs
+            self._bytes += probs.nbytes + ENTRY_OVERHEAD
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes + ENTRY_OVERHEAD
+
+    def record(self, hit):
+        METRICS.inc("prediction_cache_total", result="hit" if hit else "miss")
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def predict(self, registry, source):
+        """Return ``(probs, model_version)`` for one image, using the cache when possible."""
+        self.watch(registry)
+        data = source_bytes(source)
+        source_key = digest(data)
+        version = registry.version
+        probs = self.get_source(source_key, version)
+        if probs is None:
+            array = load_image(data)
+            key = digest(array)
+            probs = self.get(key, version)
+            if probs is None:
+                self.record(hit=False)
+                predictions, version = registry.predict(array[np.newaxis])
+                probs = predictions[0]
+                self.put(key, version, probs, source_key)
+                return probs, version
+            self._remember(key, version, probs, source_key)
+        self.record(hit=True)
+        return probs, version
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    # One cache per process; PREDICTION_CACHE_PATH enables the on-disk tier.
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PredictionCache(disk_path=os.environ.get("PREDICTION_CACHE_PATH"))
+        return _cache
@@ -0,0 +1,110 @@
+"""Image preprocessing shared by every prediction path.
+
+The UI, batch mode, HTTP service and CLIs all go through ``load_into`` so the
+model sees identical pixels everywhere.  Inputs are checked before any pixel
+data is decoded: files over ``MAX_UPLOAD_BYTES`` and images whose header
+claims more than ``MAX_PIXELS`` (decompression bombs) are rejected with
+``ImageTooLarge``.  JPEGs are decoded with Pillow's draft mode, which lets
+libjpeg scale by 1/2, 1/4 or 1/8 during decoding, so a 12 MP phone photo
+never exists at full resolution on its way to 128x128.
+"""
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+from metrics import METRICS
+
+IMAGE_SIZE = (128, 128)
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+MAX_PIXELS = 64_000_000
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def _byte_size(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    size = getattr(source, "size", None)
+    if isinstance(size, int):  # Streamlit UploadedFile
+        return size
+    if hasattr(source, "seek") and hasattr(source, "tell"):
+        position = source.tell()
+        source.seek(0, io.SEEK_END)
+        size = source.tell() - position
+        source.seek(position)
+        return size
+    return None
+
+
+def open_image(source, max_bytes=MAX_UPLOAD_BYTES, max_pixels=MAX_PIXELS):
+    # Only the header is read here; pixel data is decoded lazily by Pillow.
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    size = _byte_size(source)
+    if max_bytes and size is not None and size > max_bytes:
+        raise ImageTooLarge(f"file is {size / 2 ** 20:.1f} MB, the limit is {max_bytes / 2 ** 20:.0f} MB")
+    image = Image.open(source)
+    width, height = image.size
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLarge(f"image is {width}x{height} pixels, the limit is {max_pixels} pixels")
+    return image
+
+
+def decode(image, size=IMAGE_SIZE):
+    if image.format == "JPEG":
+        # Picks the smallest DCT scale that still covers ``size`` and decodes
+        # straight to RGB.
+        image.draft("RGB", size)
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    image.load()
+    return image
+
+
+def resize_into(image, out):
+    # ``out`` is one (height, width, 3) row of a batch buffer.
+    size = (out.shape[1], out.shape[0])
+    if image.size != size:
+        image = image.resize(size)
+    out[...] = np.asarray(image)
+    return out
+
+
+def load_into(source, out, max_bytes=MAX_UPLOAD_BYTES, max_pixels=MAX_PIXELS):
+    with open_image(source, max_bytes, max_pixels) as image:
+        with METRICS.timed("decode"):
+            decoded = decode(image, (out.shape[1], out.shape[0]))
+        with METRICS.timed("resize"):
+            return resize_into(decoded, out)
+
+
+def load_image(source, size=IMAGE_SIZE, **limits):
+    out = np.empty((size[1], size[0], 3), dtype=np.float32)
+    return load_into(source, out, **limits)
+
+
+class BatchBuffer:
+    """Preallocated float32 batch that decoders write into row by row."""
+
+    def __init__(self, batch_size, size=IMAGE_SIZE):
+        self.array = np.zeros((batch_size, size[1], size[0], 3), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.array)
+
+    def load(self, index, source):
+        # Returns None on success or the error message; a failed row is zeroed
+        # so the batch can still be run as a whole.
+        try:
+            load_into(source, self.array[index])
+            return None
+        except Exception as e:
+            self.array[index] = 0
+            return str(e)
+
+    def view(self, count):
+        return self.array[:count]
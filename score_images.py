@@ -0,0 +1,227 @@
+"""Bulk-score a directory tree (or manifest) of leaf images.
+
+    python score_images.py /data/valid --output scores.csv --report reports/valid
+    python score_images.py manifest.txt --output scores.jsonl --resume
+
+Images are decoded on a worker pool and stacked into batches by a producer
+thread; a bounded queue of ready batches keeps the model busy while memory
+stays flat.  Results are appended to the CSV/JSONL output after every batch,
+so an interrupted run can be continued with ``--resume``.
+
+When the source directory holds one sub-folder per class (the layout
+``image_dataset_from_directory`` reads), the folder name is used as the true
+label and ``--report`` writes the confusion matrix and classification report.
+A manifest is a text file with one image path per line, optionally followed
+by a comma and the true label.
+"""
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from batch_inference import IMAGE_EXTENSIONS, chunked
+from model_registry import ENGINE_PATHS, get_registry
+from preprocessing import BatchBuffer
+
+FIELDS = ["path", "label", "prediction", "class_index", "confidence", "model_version", "error"]
+
+
+def class_folders(root):
+    # Same ordering image_dataset_from_directory uses for class indices.
+    return sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)))
+
+
+def walk_images(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(dirpath, filename)
+                parts = os.path.relpath(path, root).split(os.sep)
+                yield path, parts[0] if len(parts) > 1 else ""
+
+
+def read_manifest(path):
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            image_path, _, label = line.partition(",")
+            yield os.path.join(base, image_path.strip()), label.strip()
+
+
+class ResultWriter:
+    def __init__(self, path, resume):
+        self.path = path
+        self.jsonl = path.endswith(".jsonl")
+        if resume and os.path.exists(path):
+            _drop_partial_line(path)
+        else:
+            open(path, "w").close()
+        new_file = os.path.getsize(path) == 0
+        self._file = open(path, "a", encoding="utf-8", newline="")
+        if not self.jsonl:
+            self._csv = csv.DictWriter(self._file, fieldnames=FIELDS)
+            if new_file:
+                self._csv.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            if self.jsonl:
+                self._file.write(json.dumps(row) + "\n")
+            else:
+                self._csv.writerow(row)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _drop_partial_line(path):
+    # A run killed mid-write can leave half a row behind; cut back to the last newline.
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def read_results(path):
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def produce_batches(items, batches, buffers, workers):
+    # Runs on its own thread; None marks the end of the stream.  There must be
+    # at least two more buffers than queue slots so a buffer is never refilled
+    # while the consumer is still predicting on it.
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for number, chunk in enumerate(chunked(items, len(buffers[0]))):
+                buffer = buffers[number % len(buffers)]
+                errors = list(pool.map(buffer.load, range(len(chunk)), [path for path, _ in chunk]))
+                batches.put((chunk, errors, buffer))
+    finally:
+        batches.put(None)
+
+
+def score_batch(chunk, errors, buffer, registry):
+    predictions = version = None
+    if any(error is None for error in errors):
+        predictions, version = registry.predict(buffer.view(len(chunk)))
+    rows = []
+    for position, ((path, label), error) in enumerate(zip(chunk, errors)):
+        row = dict.fromkeys(FIELDS, "")
+        row.update(path=path, label=label)
+        if error is not None:
+            row["error"] = error
+        else:
+            probs = predictions[position]
+            index = int(np.argmax(probs))
+            # The model's own class name, so it compares directly with folder labels.
+            class_names = registry.class_names
+            name = class_names[index] if index < len(class_names) else f"Class {index}"
+            row.update(prediction=name, class_index=index, confidence=round(float(probs[index]), 6), model_version=version)
+        rows.append(row)
+    return rows
+
+
+def write_report(results_path, class_names, report_prefix):
+    # Compare by class name so manifests and folder trees are handled alike.
+    index = {name: i for i, name in enumerate(class_names)}
+    y_true, y_pred = [], []
+    for row in read_results(results_path):
+        if row.get("label") in index and row.get("prediction") in index:
+            y_true.append(index[row["label"]])
+            y_pred.append(index[row["prediction"]])
+    if not y_true:
+        print("No labelled predictions; skipping report.", file=sys.stderr)
+        return
+    n = len(class_names)
+    cm = np.zeros((n, n), dtype=np.int64)
+    np.add.at(cm, (np.array(y_true), np.array(y_pred)), 1)
+    os.makedirs(os.path.dirname(report_prefix) or ".", exist_ok=True)
+    with open(report_prefix + "_confusion_matrix.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([""] + class_names)
+        for name, counts in zip(class_names, cm):
+            writer.writerow([name] + counts.tolist())
+    accuracy = float(np.trace(cm)) / cm.sum()
+    print(f"Accuracy: {accuracy:.4f} on {cm.sum()} images")
+    try:
+        from sklearn.metrics import classification_report
+    except ImportError:
+        print("scikit-learn is not installed; skipping classification report.", file=sys.stderr)
+        return
+    report = classification_report(y_true, y_pred, labels=list(range(n)), target_names=class_names, zero_division=0)
+    with open(report_prefix + "_classification_report.txt", "w", encoding="utf-8") as f:
+        f.write(report)
+    print(report)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score many leaf images with the disease model.")
+    parser.add_argument("source", help="image directory (one sub-folder per class) or manifest file")
+    parser.add_argument("--output", required=True, help="results file, .csv or .jsonl")
+    parser.add_argument("--model", help="model file; defaults to the file for --engine")
+    parser.add_argument("--engine", choices=sorted(ENGINE_PATHS))
+    parser.add_argument("--threads", type=int, help="TFLite interpreter threads")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1), help="decode threads")
+    parser.add_argument("--prefetch", type=int, default=4, help="decoded batches to keep ready")
+    parser.add_argument("--resume", action="store_true", help="skip images already in --output")
+    parser.add_argument("--report", help="path prefix for the confusion matrix and classification report")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.source):
+        class_names = class_folders(args.source)
+        items = walk_images(args.source)
+    else:
+        class_names = []
+        items = read_manifest(args.source)
+    # The writer trims a half-written last row first, so its image is scored again.
+    writer = ResultWriter(args.output, args.resume)
+    done = {row["path"] for row in read_results(args.output)} if args.resume else set()
+    items = (item for item in items if item[0] not in done)
+
+    registry = get_registry(args.model, args.engine, args.threads)
+    batches = queue.Queue(maxsize=args.prefetch)
+    buffers = [BatchBuffer(args.batch_size) for _ in range(args.prefetch + 2)]
+    producer = threading.Thread(target=produce_batches, args=(items, batches, buffers, args.workers), daemon=True)
+    producer.start()
+    scored = len(done)
+    try:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            chunk, errors, buffer = batch
+            writer.write(score_batch(chunk, errors, buffer, registry))
+            scored += len(chunk)
+            print(f"\rScored {scored} images", end="", file=sys.stderr, flush=True)
+    finally:
+        writer.close()
+        print(file=sys.stderr)
+    if args.report:
+        # Predictions of classes with no folder (e.g. another crop) still count as errors.
+        seen = {name for row in read_results(args.output) for name in (row.get("label"), row.get("prediction")) if name}
+        class_names = class_names + sorted(seen - set(class_names))
+        write_report(args.output, class_names, args.report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Bounded key/value table in SQLite, shared by the on-disk caches.
+
+Rows carry a ``last_used`` timestamp and the least recently used ones are
+evicted once the table holds more than ``max_entries``.  A read hit only
+rewrites ``last_used`` when it is older than ``TOUCH_INTERVAL``, so most
+reads never commit a write.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+TOUCH_INTERVAL = 300.0
+
+
+class SQLiteLRU:
+    def __init__(self, path, table, key_columns, value_column, value_type, max_entries, touch_interval=TOUCH_INTERVAL):
+        self.path = path
+        self.table = table
+        self.key_columns = key_columns
+        self.value_column = value_column
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._where = " AND ".join(f"{column} = ?" for column in key_columns)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            keys = ", ".join(f"{column} TEXT NOT NULL" for column in key_columns)
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                f"{keys}, {value_column} {value_type} NOT NULL, "
+                f"last_used REAL NOT NULL, PRIMARY KEY ({', '.join(key_columns)}))"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_used ON {table} (last_used)")
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self.value_column}, last_used FROM {self.table} WHERE {self._where}", key
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] > self.touch_interval:
+                with self._conn:
+                    self._conn.execute(f"UPDATE {self.table} SET last_used = ? WHERE {self._where}", (now,) + tuple(key))
+            return row[0]
+
+    def put(self, key, value):
+        columns = ", ".join(self.key_columns + [self.value_column, "last_used"])
+        placeholders = ", ".join("?" * (len(self.key_columns) + 2))
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} ({columns}) VALUES ({placeholders})",
+                tuple(key) + (value, time.time()),
+            )
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE rowid IN "
+                    f"(SELECT rowid FROM {self.table} ORDER BY last_used LIMIT ?)", (excess,)
+                )
+
+    def delete(self, column, value):
+        # Drop every row whose key ``column`` equals ``value``.
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE {column} = ?", (value,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
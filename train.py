@@ -0,0 +1,219 @@
+"""Train the leaf disease CNN from the command line.
+
+    python train.py --train-dir /data/train --validation-dir /data/valid --epochs 8
+    python train.py --train-dir /data/train --validation-dir /data/valid --epochs 8   # resumes if interrupted
+
+Same data, architecture and optimizer as Train_plant_disease, with an input
+pipeline built for CPU nodes: every image is decoded and resized once, the
+uint8 tensors are cached under ``--cache-dir`` and later epochs read the
+cache instead of the JPEGs.  The cache is keyed by the directory's contents
+and a half-written one (run killed in the first epoch) is discarded and
+rebuilt.  Shuffling, augmentation and batching run after
+the cache in parallel with training, and batches are prefetched.
+
+A backup is written under ``--checkpoint-dir`` after every epoch; rerunning
+the same command after a crash continues from the last finished epoch.
+``training_hist.json`` gets accuracy and loss as before, plus the wall time
+and training images per second of each epoch, and is rewritten after every
+epoch.  The finished model replaces ``--output`` atomically, so a running
+app picks it up as a new version.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+
+from class_labels import class_names_path
+from model_architecture import INPUT_SHAPE
+from model_registry import DEFAULT_MODEL_PATH
+
+CACHE_DIR = os.path.join(".cache", "tfdata")
+CHECKPOINT_DIR = "checkpoints"
+HISTORY_PATH = "training_hist.json"
+SHUFFLE_BUFFER = 4096
+
+
+def configure_threads(intra_op=None, inter_op=None):
+    # Must run before TensorFlow executes its first op.
+    import tensorflow as tf
+    if intra_op:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    if inter_op:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+
+
+def fingerprint(directory):
+    # File count, total size and newest mtime: adding, removing or replacing
+    # an image changes it, without reading any pixels.
+    count, size, newest = 0, 0, 0.0
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            stat = os.stat(os.path.join(dirpath, filename))
+            count += 1
+            size += stat.st_size
+            newest = max(newest, stat.st_mtime)
+    return f"{count}|{size}|{newest}"
+
+
+def cache_path(cache_dir, directory):
+    # One cache per source directory, its contents and the image size, so a
+    # changed dataset never reads stale tensors.
+    key = f"{os.path.abspath(directory)}|{fingerprint(directory)}|{INPUT_SHAPE}"
+    name = os.path.basename(os.path.normpath(directory)) or "data"
+    return os.path.join(cache_dir, f"{name}_{hashlib.sha256(key.encode()).hexdigest()[:12]}")
+
+
+def discard_partial_cache(path):
+    # A run killed while the cache was being written leaves a lockfile and
+    # partial shards but no index; TensorFlow refuses to start over on them.
+    if os.path.exists(path + ".index"):
+        return
+    for leftover in glob.glob(glob.escape(path) + "*"):
+        os.remove(leftover)
+
+
+def augment(images, labels):
+    import tensorflow as tf
+    images = tf.image.random_flip_left_right(images)
+    images = tf.image.random_flip_up_down(images)
+    images = tf.clip_by_value(tf.image.random_brightness(images, max_delta=20.0), 0.0, 255.0)
+    return images, labels
+
+
+def input_pipeline(directory, batch_size, cache_dir=CACHE_DIR, training=False, augmented=True, class_names=None,
+                   shuffle_buffer=SHUFFLE_BUFFER, data_threads=None, seed=None):
+    """Return ``(dataset, class_names, image_count)`` for a class-per-folder directory."""
+    import tensorflow as tf
+    autotune = tf.data.AUTOTUNE
+    images = tf.keras.utils.image_dataset_from_directory(
+        directory,
+        labels="inferred",
+        label_mode="categorical",
+        class_names=class_names,
+        color_mode="rgb",
+        batch_size=None,
+        image_size=INPUT_SHAPE[:2],
+        shuffle=False,
+        interpolation="bilinear",
+    )
+    class_names = images.class_names
+    count = int(images.cardinality())
+    # uint8 keeps the on-disk cache at a quarter of the float32 size.
+    dataset = images.map(lambda x, y: (tf.cast(tf.round(x), tf.uint8), y), num_parallel_calls=autotune)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = cache_path(cache_dir, directory)
+        discard_partial_cache(path)
+        dataset = dataset.cache(path)
+    if training:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size, num_parallel_calls=autotune)
+    dataset = dataset.map(lambda x, y: (tf.cast(x, tf.float32), y), num_parallel_calls=autotune)
+    if training and augmented:
+        dataset = dataset.map(augment, num_parallel_calls=autotune)
+    options = tf.data.Options()
+    if data_threads:
+        options.threading.private_threadpool_size = data_threads
+    dataset = dataset.with_options(options).prefetch(autotune)
+    return dataset, class_names, count
+
+
+def epoch_logger(path, train_images, resume):
+    """Keras callback that writes the history with per-epoch timings after every epoch."""
+    import tensorflow as tf
+
+    class EpochLogger(tf.keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.history = {}
+            if resume and os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    self.history = json.load(f)
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self.start = time.perf_counter()
+            self.train_seconds = None
+
+        def on_test_begin(self, logs=None):
+            # Validation runs at the end of the epoch; stop the training clock.
+            if self.train_seconds is None:
+                self.train_seconds = time.perf_counter() - self.start
+
+        def on_epoch_end(self, epoch, logs=None):
+            seconds = time.perf_counter() - self.start
+            train_seconds = self.train_seconds or seconds
+            values = dict(logs or {})
+            values["epoch_seconds"] = seconds
+            values["images_per_second"] = train_images / train_seconds if train_seconds else 0.0
+            for key, value in values.items():
+                # ``epoch`` is absolute, so a resumed run overwrites any epoch
+                # that was logged but not backed up before the interruption.
+                series = self.history.setdefault(key, [])[:epoch]
+                series.extend([None] * (epoch - len(series)))
+                self.history[key] = series + [float(value)]
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.history, f)
+            os.replace(tmp_path, path)
+            print(f"epoch {epoch + 1}: {seconds:.1f}s, {values['images_per_second']:.1f} images/s")
+
+    return EpochLogger()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the leaf disease CNN.")
+    parser.add_argument("--train-dir", required=True, help="class-per-folder training images")
+    parser.add_argument("--validation-dir", help="class-per-folder validation images")
+    parser.add_argument("--output", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--epochs", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--learning-rate", type=float, default=0.0001)
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="where decoded images are cached; '' disables")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR)
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--shuffle-buffer", type=int, default=SHUFFLE_BUFFER)
+    parser.add_argument("--no-augment", action="store_true", help="train on the images as they are")
+    parser.add_argument("--intra-op-threads", type=int, help="threads used inside one op (default: all cores)")
+    parser.add_argument("--inter-op-threads", type=int, help="ops run concurrently (default: TensorFlow's choice)")
+    parser.add_argument("--data-threads", type=int, help="threads for decoding and augmentation")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    configure_threads(args.intra_op_threads, args.inter_op_threads)
+    import tensorflow as tf
+    from model_architecture import build_plant_cnn, compile_plant_cnn
+
+    train_set, class_names, train_images = input_pipeline(
+        args.train_dir, args.batch_size, args.cache_dir, training=True, augmented=not args.no_augment,
+        shuffle_buffer=args.shuffle_buffer, data_threads=args.data_threads, seed=args.seed,
+    )
+    validation_set = None
+    if args.validation_dir:
+        validation_set, _, _ = input_pipeline(
+            args.validation_dir, args.batch_size, args.cache_dir, class_names=class_names,
+            data_threads=args.data_threads,
+        )
+
+    resume = os.path.isdir(args.checkpoint_dir) and bool(os.listdir(args.checkpoint_dir))
+    if resume:
+        print(f"Resuming from {args.checkpoint_dir}")
+    cnn = compile_plant_cnn(build_plant_cnn(len(class_names)), args.learning_rate)
+    callbacks = [
+        tf.keras.callbacks.BackupAndRestore(args.checkpoint_dir),
+        epoch_logger(args.history, train_images, resume),
+    ]
+    cnn.fit(x=train_set, validation_data=validation_set, epochs=args.epochs, callbacks=callbacks)
+
+    root, ext = os.path.splitext(args.output)
+    tmp_path = f"{root}.tmp{ext}"
+    cnn.save(tmp_path)
+    with open(class_names_path(args.output), "w", encoding="utf-8") as f:
+        json.dump(class_names, f, indent=2)
+    os.replace(tmp_path, args.output)
+    print(f"Wrote {args.output}, {class_names_path(args.output)} and {args.history}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Translation lookups that stay off the network on the hot path.
+
+A lookup tries, in order: the pre-translated language pack for the target
+language (built offline by build_language_packs.py and loaded once per
+process), a small in-memory LRU, the persistent on-disk cache and only then
+GoogleTranslator.  Network results are written back to the disk cache, which
+is bounded and evicts the least recently used entries.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from metrics import METRICS
+from sqlite_lru import SQLiteLRU
+
+PACK_DIR = "language_packs"
+CACHE_PATH = os.path.join(".cache", "translations.sqlite3")
+MAX_DISK_ENTRIES = 20000
+MAX_MEMORY_ENTRIES = 2048
+LANGUAGE_CODES = {"English": "en", "Telugu": "te"}
+
+
+def google_translate(text, target):
+    from deep_translator import GoogleTranslator
+    return GoogleTranslator(source="auto", target=target).translate(text)
+
+
+def load_language_packs(pack_dir=PACK_DIR):
+    packs = {}
+    if not os.path.isdir(pack_dir):
+        return packs
+    for filename in os.listdir(pack_dir):
+        if filename.endswith(".json"):
+            with open(os.path.join(pack_dir, filename), encoding="utf-8") as f:
+                packs[filename[:-len(".json")]] = json.load(f)
+    return packs
+
+
+class TranslationCache:
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_DISK_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._store = SQLiteLRU(path, "translations", ["text", "target"], "translated", "TEXT", max_entries)
+
+    def get(self, text, target):
+        return self._store.get((text, target))
+
+    def put(self, text, target, translated):
+        self._store.put((text, target), translated)
+
+    def __len__(self):
+        return len(self._store)
+
+
+class Translator:
+    def __init__(self, packs=None, cache=None, translate_fn=google_translate, memory_entries=MAX_MEMORY_ENTRIES):
+        self.packs = packs if packs is not None else {}
+        self.cache = cache
+        self.translate_fn = translate_fn
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls):
+        return cls(load_language_packs(), TranslationCache())
+
+    def translate(self, text, target):
+        if not text or target in (None, "en"):
+            return text
+        translated = self.packs.get(target, {}).get(text)
+        if translated is not None:
+            METRICS.inc("translation_lookups_total", source="pack")
+            return translated
+        key = (text, target)
+        with self._lock:
+            translated = self._memory.get(key)
+            if translated is not None:
+                self._memory.move_to_end(key)
+        if translated is not None:
+            METRICS.inc("translation_lookups_total", source="memory")
+            return translated
+        if self.cache is not None:
+            with METRICS.timed("translation_disk"):
+                translated = self.cache.get(text, target)
+            if translated is not None:
+                METRICS.inc("translation_lookups_total", source="disk")
+        if translated is None:
+            METRICS.inc("translation_lookups_total", source="network")
+            with METRICS.timed("translation_network"):
+                translated = self.translate_fn(text, target)
+            if translated is None:
+                return text
+            if self.cache is not None:
+                self.cache.put(text, target, translated)
+        with self._lock:
+            self._memory[key] = translated
+            if len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+        return translated